@@ -1,38 +1,81 @@
-from anthropic import Anthropic, RateLimitError
-import time
+from anthropic import AsyncAnthropic
 
-class ClaudeClient:
-    def __init__(self, config, rate_limiter):
-        self.client = Anthropic(api_key=config.api_key)
-        self.config = config
-        self.rate_limiter = rate_limiter
-    
-    def create_message(self, prompt, max_retries=None):
-        if max_retries is None:
-            max_retries = self.config.max_retries
-            
-        for attempt in range(max_retries):
-            try:
-                self.rate_limiter.wait_if_needed()
-                
-                response = self.client.messages.create(
-                    model=self.config.model,
-                    max_tokens=self.config.max_tokens,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                
-                return response.content[0].text if response.content else ""
-                
-            except RateLimitError as e:
-                if attempt < max_retries - 1:
-                    delay = self.config.initial_delay * (2 ** attempt)
-                    print(f"Rate limit exceeded. Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                else:
-                    raise
-            except Exception as e:
-                print(f"Error in API call: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
\ No newline at end of file
+from base_client import LLMClient
+
+class ClaudeClient(LLMClient):
+    def __init__(self, config, rate_limiter, token_counter=None, cache=None, metrics=None):
+        super().__init__(config, rate_limiter, token_counter, cache, metrics)
+        self.model = config.model
+        self.max_tokens = config.max_tokens
+    
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        params = self._message_params(prompt, system, max_tokens, prefill)
+        if self.config.stream_responses:
+            text, response = await self._stream_async(params, on_text)
+        else:
+            text, response = await self._request_async(params)
+        return text, self._response_usage(response), response.stop_reason == "max_tokens"
+    
+    def _create_async_client(self):
+        # Retries are left to the client's RetryPolicy instead of the SDK
+        return AsyncAnthropic(api_key=self.config.api_key, max_retries=0)
+    
+    async def _request_async(self, params):
+        raw_response = await self._async_client().messages.with_raw_response.create(**params)
+        self.rate_limiter.update_from_headers(raw_response.headers)
+        response = await raw_response.parse()
+        return self._response_text(response), response
+    
+    async def _stream_async(self, params, on_text):
+        # Text arrives as it is generated; on_text sees every fragment, and the
+        # joined text is returned once the message is complete.
+        parts = []
+        async with self._async_client().messages.stream(**params) as stream:
+            self.rate_limiter.update_from_headers(self._stream_headers(stream))
+            async for text in stream.text_stream:
+                parts.append(text)
+                if on_text:
+                    on_text(text)
+            response = await stream.get_final_message()
+        return "".join(parts), response
+    
+    def _message_params(self, prompt, system=None, max_tokens=None, prefill=None):
+        params = {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if prefill:
+            # The model continues its own unfinished answer
+            params["messages"].append({"role": "assistant", "content": prefill})
+        if system:
+            params["system"] = self._system_blocks(system)
+        return params
+    
+    def _system_blocks(self, system):
+        # The cache_control breakpoint caches everything up to and including
+        # the system prompt, so calls that share it only pay for it once
+        block = {"type": "text", "text": system}
+        if self.config.prompt_caching:
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+    
+    def _response_usage(self, response):
+        usage = response.usage
+        return self._usage(
+            usage.input_tokens,
+            usage.output_tokens,
+            getattr(usage, "cache_read_input_tokens", 0),
+            getattr(usage, "cache_creation_input_tokens", 0)
+        )
+    
+    @staticmethod
+    def _response_text(response):
+        return response.content[0].text if response.content else ""
+    
+    @staticmethod
+    def _stream_headers(stream):
+        response = getattr(stream, "response", None)
+        return getattr(response, "headers", None)
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+
+from retry import RetryPolicy, RATE_LIMIT_STATUS_CODE, status_code
+
+class LLMClient(ABC):
+    # Shared core of every provider client: response cache, rate limiting,
+    # retries and usage accounting. A provider subclass sets model and
+    # max_tokens and implements _send_async and _create_async_client.
+    # _send_async returns the text, a usage dict with the USAGE_FIELDS token counts
+    # and whether the response was cut off at max_tokens. With a prefill it
+    # continues that text instead of starting a new response.
+    USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+    # Whether the model continues the prefill in place, as with an assistant
+    # prefill, and so writes any whitespace it ended with again. Otherwise the
+    # continuation is a new reply that starts after that whitespace.
+    CONTINUES_PREFILL = True
+    
+    def __init__(self, config, rate_limiter, token_counter=None, cache=None, metrics=None):
+        self.config = config
+        self.rate_limiter = rate_limiter
+        self.token_counter = token_counter
+        self.cache = cache
+        self.metrics = metrics
+        # Shared by all calls, so the circuit breaker sees every overloaded response
+        self.retry_policy = RetryPolicy(config)
+        self.usage = dict.fromkeys(self.USAGE_FIELDS, 0)
+        self._usage_lock = threading.Lock()
+        self._local = threading.local()
+    
+    async def create_message_async(self, prompt, max_retries=None, on_text=None, system=None, output_ratio=None):
+        # system holds instructions shared by many calls; providers that
+        # support prompt caching mark it as a cacheable prefix. output_ratio is
+        # the expected output tokens per prompt token, used to size max_tokens.
+        with self._measure_call() as call:
+            cache_key = self._cache_key(prompt, system)
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                call["cache_hit"] = True
+                return cached
+            input_tokens = self._estimate_tokens(prompt) + (self._estimate_tokens(system) if system else 0)
+            max_tokens = self._output_budget(prompt, output_ratio)
+            parts = []
+            
+            while True:
+                prefill = parts[0] if parts else None
+                request_tokens = input_tokens + (self._estimate_tokens(prefill) if prefill else 0)
+                
+                async def attempt():
+                    call["throttled"] += await self.rate_limiter.wait_if_needed_async(request_tokens)
+                    return await self._send_async(prompt, on_text, system, max_tokens, prefill)
+                
+                try:
+                    text, usage, cut_off = await self.retry_policy.call_async(attempt, max_retries, self._on_retry(call))
+                except Exception as e:
+                    print(f"Error in API call: {str(e)}")
+                    raise
+                self._record_usage(request_tokens, usage, call)
+                parts.append(text)
+                if not self._continues(call, parts, cut_off):
+                    break
+                max_tokens = self.max_tokens
+            
+            text = "".join(parts)
+            # A response that is still cut off is used, but not cached
+            if not cut_off:
+                self._store_response(cache_key, text)
+            return text
+    
+    def usage_totals(self):
+        with self._usage_lock:
+            return dict(self.usage)
+    
+    @abstractmethod
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        pass
+    
+    @abstractmethod
+    def _create_async_client(self):
+        pass
+    
+    def _measure_call(self):
+        # Without metrics the call still fills in a record; it is just not kept
+        if self.metrics is None:
+            return nullcontext({"retries": 0, "throttled": 0.0, "continuations": 0, **dict.fromkeys(self.USAGE_FIELDS, 0)})
+        return self.metrics.call()
+    
+    def _output_budget(self, prompt, output_ratio):
+        # Ask for about what the prompt should produce, with some headroom,
+        # instead of the model's maximum; a response that still runs out is
+        # continued
+        if output_ratio is None:
+            return self.max_tokens
+        budget = int(self._estimate_tokens(prompt) * output_ratio * self.config.output_token_headroom)
+        return max(min(self.config.min_output_tokens, self.max_tokens), min(budget, self.max_tokens))
+    
+    def _continues(self, call, parts, cut_off):
+        # Whether to ask for the rest of a response that was cut off at
+        # max_tokens; parts is left holding the text to continue from
+        if not cut_off:
+            return False
+        if call["continuations"] >= self.config.max_continuations:
+            print("Response cut off at max_tokens and no continuations are left. Keeping the text received so far.")
+            return False
+        call["continuations"] += 1
+        text = "".join(parts)
+        # A prefill must not end with whitespace; the model writes it again
+        parts[:] = [text.rstrip() if self.CONTINUES_PREFILL else text]
+        print(f"Response cut off at max_tokens. Requesting continuation {call['continuations']}...")
+        return True
+    
+    def _record_usage(self, estimated_input_tokens, usage, call):
+        # Cached prompt tokens are billed at a discount but still count
+        # towards the input tokens per minute limit
+        input_tokens = usage["input_tokens"] + usage["cache_read_input_tokens"] + usage["cache_creation_input_tokens"]
+        self.rate_limiter.record_usage(estimated_input_tokens, input_tokens, usage["output_tokens"])
+        with self._usage_lock:
+            for field in self.USAGE_FIELDS:
+                self.usage[field] += usage[field]
+        for field in self.USAGE_FIELDS:
+            call[field] += usage[field]
+    
+    @staticmethod
+    def _usage(input_tokens=0, output_tokens=0, cache_read_input_tokens=0, cache_creation_input_tokens=0):
+        return {
+            "input_tokens": input_tokens or 0,
+            "output_tokens": output_tokens or 0,
+            "cache_read_input_tokens": cache_read_input_tokens or 0,
+            "cache_creation_input_tokens": cache_creation_input_tokens or 0,
+        }
+    
+    def _on_retry(self, call):
+        def on_retry(error, retries, delay):
+            call["retries"] = retries
+            # A rate limit also pauses the other requests through the shared limiter
+            response = getattr(error, "response", None)
+            self.rate_limiter.update_from_headers(getattr(response, "headers", None))
+            if status_code(error) == RATE_LIMIT_STATUS_CODE:
+                call["throttled"] += delay
+                print(f"Rate limit exceeded. Retrying in {delay:.1f} seconds...")
+            else:
+                print(f"Error in API call: {str(error)}. Retrying in {delay:.1f} seconds...")
+        return on_retry
+    
+    def _cache_key(self, prompt, system=None):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(self.model, self.max_tokens, prompt, system=system)
+    
+    def _cached_response(self, cache_key):
+        if cache_key is None:
+            return None
+        return self.cache.get(cache_key)
+    
+    def _store_response(self, cache_key, text):
+        if cache_key is not None and text:
+            self.cache.set(cache_key, text)
+    
+    def _estimate_tokens(self, prompt):
+        if self.token_counter is not None:
+            return self.token_counter.count_tokens(prompt)
+        return len(prompt) // 4
+    
+    def _async_client(self):
+        # Async SDK clients keep a connection pool bound to the event loop they
+        # were first used on, so each thread keeps one client per running loop.
+        loop = asyncio.get_running_loop()
+        if getattr(self._local, "loop", None) is not loop:
+            self._local.loop = loop
+            self._local.client = self._create_async_client()
+        return self._local.client
@@ -0,0 +1,55 @@
+import argparse
+
+from config import Config
+from document_processor import DocumentProcessor
+from input_reader import STDIN
+from main import create_processor, print_cache_stats
+from scheduler import DocumentScheduler
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Process every transcript in a directory or glob.")
+    parser.add_argument("inputs", nargs="+", help="Directories (all .txt files) or glob patterns, or - to read one transcript from standard input")
+    parser.add_argument("--workers", type=int, default=None, help="Documents processed at the same time")
+    parser.add_argument("--priority", help="File listing documents to process first, one per line")
+    parser.add_argument("--force", action="store_true", help="Process documents that already have an output file")
+    parser.add_argument("--provider", choices=["anthropic", "openai", "fake"], help="Model provider to use")
+    parser.add_argument("--backend", choices=["realtime", "batch"], help="Send requests one by one or as message batches")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = Config()
+    if args.provider:
+        config.provider = args.provider
+    if args.backend:
+        config.execution_backend = args.backend
+    processor, client, response_cache = create_processor(config)
+    
+    if args.inputs == [STDIN]:
+        # A piped transcript is processed on its own and saved in the working directory
+        result = processor.process_document(STDIN)
+        print_cache_stats(config, response_cache, client)
+        return 0 if result else 1
+    
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(path for path in DocumentScheduler.collect(pattern) if path not in paths)
+    
+    priority = None
+    if args.priority:
+        with open(args.priority, 'r', encoding='utf-8') as file:
+            priority = [line.strip() for line in file if line.strip()]
+    
+    # All documents share one processor, and with it one client, rate limiter and cache
+    scheduler = DocumentScheduler(
+        processor.process_document,
+        DocumentProcessor.find_output,
+        args.workers or config.batch_workers,
+        client.usage_totals
+    )
+    summary = scheduler.run(DocumentScheduler.order(paths, priority), skip_done=not args.force)
+    print_cache_stats(config, response_cache, client)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+import time
+
+class MessageBatchBackend:
+    def __init__(self, config, batches=None, cache=None, sleep=time.sleep):
+        if batches is None:
+            from anthropic import Anthropic
+            batches = Anthropic(api_key=config.api_key).messages.batches
+        self.config = config
+        self.batches = batches
+        self.cache = cache
+        self.sleep = sleep
+    
+    def run(self, prompts, system=None):
+        # Returns one response text per prompt, in the same order. Requests
+        # that the batch reports as failed come back as None so the caller can
+        # keep the ones that succeeded. The system prompt is shared by all of them.
+        results = [None] * len(prompts)
+        pending = []
+        for i, prompt in enumerate(prompts):
+            cached = self.cache.get(self._cache_key(prompt, system)) if self.cache else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        size = self.config.batch_max_requests
+        for start in range(0, len(pending), size):
+            part = pending[start:start + size]
+            texts = self._run_batch([prompts[i] for i in part], system)
+            for i, text in zip(part, texts):
+                results[i] = text
+                if text and self.cache:
+                    self.cache.set(self._cache_key(prompts[i], system), text)
+        
+        return results
+    
+    def _run_batch(self, prompts, system=None):
+        requests = [
+            {
+                "custom_id": f"request-{i}",
+                "params": self._message_params(prompt, system)
+            }
+            for i, prompt in enumerate(prompts)
+        ]
+        
+        batch = self.batches.create(requests=requests)
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+        
+        while batch.processing_status != "ended":
+            self.sleep(self.config.batch_poll_interval)
+            batch = self.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            print(f"Batch {batch.id}: {counts.processing} processing, {counts.succeeded} succeeded, "
+                  f"{counts.errored} errored")
+        
+        texts = [None] * len(prompts)
+        for entry in self.batches.results(batch.id):
+            index = int(entry.custom_id.rsplit("-", 1)[1])
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                texts[index] = message.content[0].text if message.content else ""
+                # Batched requests are not continued; the text received so far is used
+                if getattr(message, "stop_reason", None) == "max_tokens":
+                    print(f"Batch request {entry.custom_id} was cut off at max_tokens")
+            else:
+                print(f"Batch request {entry.custom_id} did not succeed: {entry.result.type}")
+        return texts
+    
+    def _message_params(self, prompt, system):
+        params = {
+            "model": self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if system:
+            # Batched requests read the prompt cache too, on a best-effort basis
+            block = {"type": "text", "text": system}
+            if self.config.prompt_caching:
+                block["cache_control"] = {"type": "ephemeral"}
+            params["system"] = [block]
+        return params
+    
+    def _cache_key(self, prompt, system=None):
+        return self.cache.make_key(self.config.model, self.config.max_tokens, prompt, system=system)
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import threading
+
+class RunCheckpoint:
+    STAGES = ("split", "expanded", "combined")
+    
+    def __init__(self, runs_dir, file_path):
+        absolute_path = os.path.abspath(file_path)
+        base_name = os.path.splitext(os.path.basename(absolute_path))[0]
+        path_hash = hashlib.sha256(absolute_path.encode("utf-8")).hexdigest()[:12]
+        self.run_dir = os.path.join(runs_dir, f"{base_name}_{path_hash}")
+        self.used_keys = {stage: set() for stage in self.STAGES}
+        self.reused = {stage: 0 for stage in self.STAGES}
+    
+    @staticmethod
+    def fingerprint(*parts):
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def load(self, stage, key):
+        self.used_keys[stage].add(key)
+        try:
+            with open(self._path(stage, key), "r", encoding="utf-8") as file:
+                value = json.load(file)
+        except (FileNotFoundError, ValueError):
+            # A missing or half-written unit simply has to be redone
+            return None
+        self.reused[stage] += 1
+        return value
+    
+    def save(self, stage, key, value):
+        self.used_keys[stage].add(key)
+        self._write(self._path(stage, key), value)
+    
+    def load_chunks(self):
+        try:
+            with open(os.path.join(self.run_dir, "chunks.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def save_chunks(self, chunks):
+        self._write(os.path.join(self.run_dir, "chunks.json"), chunks)
+    
+    def saved_calls(self):
+        return sum(self.reused.values())
+    
+    def prune(self):
+        # Remove units that the latest completed run did not use
+        removed = 0
+        for stage in self.STAGES:
+            stage_dir = os.path.join(self.run_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for name in os.listdir(stage_dir):
+                key = name[:-5] if name.endswith(".json") else None
+                if key not in self.used_keys[stage]:
+                    os.remove(os.path.join(stage_dir, name))
+                    removed += 1
+        return removed
+    
+    def _path(self, stage, key):
+        return os.path.join(self.run_dir, stage, f"{key}.json")
+    
+    def _write(self, path, value):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write to a temporary file first so a crash never leaves a truncated unit
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(value, file, ensure_ascii=False)
+        os.replace(temporary_path, path)
\ No newline at end of file
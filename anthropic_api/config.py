@@ -4,11 +4,73 @@ from dotenv import load_dotenv
 class Config:
     def __init__(self):
         load_dotenv()
+        self.provider = os.getenv("LLM_PROVIDER", "anthropic")  # "anthropic", "openai" or "fake"
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         self.model = "claude-3-5-sonnet-20240620"
-        self.max_tokens = 8192
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_model = "gpt-4-0125-preview"
+        self.openai_max_tokens = 4096
+        self.fake_latency = 0.0  # Seconds per call for the fake provider
+        self.max_tokens = 8192  # Upper bound; each call asks for what its prompt should need
+        self.min_output_tokens = 1024  # Smallest max_tokens a call asks for
+        self.output_token_headroom = 1.5  # max_tokens over the expected output
+        self.split_output_ratio = 1.2  # Expected output tokens per prompt token when splitting into sections
+        self.expansion_output_ratio = 3  # Expected output tokens per prompt token when expanding a section
+        self.combination_output_ratio = 1.2  # Expected output tokens per prompt token when combining sections
+        self.max_continuations = 3  # Follow-up requests for a response cut off at max_tokens
+        self.stream_responses = True  # Receive responses incrementally through the streaming API
+        self.prompt_caching = True  # Mark the shared instructions in the system prompt as cacheable
         self.max_retries = 5
-        self.initial_delay = 1
-        self.request_delay = 1.2  # Minimum time between requests
+        self.initial_delay = 1  # Backoff cap for the first retry; each retry waits a random share of the cap
+        self.retry_max_delay = 60  # Upper bound for the backoff cap
+        self.circuit_breaker_threshold = 3  # Overloaded (529) responses in a row before requests pause
+        self.circuit_breaker_cooldown = 30  # Seconds requests pause while the provider is overloaded
+        self.document_deadline_seconds = None  # No API call starts after this many seconds per document
+        self.document_retry_budget = 50  # Retries allowed per document across all its calls
         self.requests_per_minute = 50
-        self.target_token_count = 25000
\ No newline at end of file
+        self.request_burst = 5  # Requests that may be sent back to back
+        self.input_tokens_per_minute = 40000
+        self.output_tokens_per_minute = 8000
+        self.target_token_count = 25000
+        self.stream_input_mb = 20  # Larger inputs, and standard input, are chunked while they are read
+        self.input_block_size = 1024 * 1024  # Bytes read at a time
+        self.input_fallback_encoding = "cp1252"  # For input that is not UTF-8, e.g. saved on Windows
+        self.chunk_boundary_window = 0.1  # Share of target_token_count searched for a speaker turn, paragraph or sentence break
+        self.chunk_overlap_tokens = 0  # Tokens repeated at the start of the next chunk; overlapping text is split twice
+        self.tokenizer_backend = os.getenv("TOKENIZER_BACKEND", "auto")  # "auto", "bundled", "transformers" or "approximate"
+        self.tokenizer_path = os.getenv("TOKENIZER_PATH")  # tokenizer.json; defaults to vocab/gpt2-tokenizer.json
+        self.combine_token_budget = 6000  # Expanded tokens per combination call; the output has to fit in max_tokens
+        self.max_concurrent_requests = 5  # Sections expanded at the same time
+        self.batch_workers = 2  # Documents processed at the same time by batch.py
+        self.service_workers = int(os.getenv("SERVICE_WORKERS", "2"))  # Jobs processed at the same time by service.py
+        self.service_host = os.getenv("SERVICE_HOST", "127.0.0.1")
+        self.service_port = int(os.getenv("SERVICE_PORT", "8765"))
+        self.service_socket = os.getenv("SERVICE_SOCKET")  # Unix socket path to listen on instead of host and port
+        self.service_jobs_dir = os.getenv(
+            "SERVICE_JOBS_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jobs")
+        )  # Transcripts submitted as text, and their results
+        self.service_job_history = 1000  # Finished jobs kept for status and result requests
+        self.persistent_event_loops = False  # Keep each thread's event loop, and its connections, between documents
+        self.execution_backend = os.getenv("EXECUTION_BACKEND", "realtime")  # "realtime" or "batch" (Message Batches API)
+        self.batch_poll_interval = 60  # Seconds between Message Batches status checks
+        self.batch_max_requests = 10000  # Requests per submitted message batch
+        self.cache_path = os.getenv(
+            "RESPONSE_CACHE_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite")
+        )
+        self.cache_max_age_days = 30
+        self.cache_max_size_mb = 500
+        self.cache_bypass = os.getenv("RESPONSE_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+        self.resume_runs = True  # Save each completed step so failed runs can resume
+        self.incremental = True  # Keep unchanged chunks from the previous run of the same file
+        self.runs_dir = os.getenv(
+            "RUNS_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".runs")
+        )
+        self.metrics_enabled = True  # Time each stage and API call and write a JSON report per run
+        self.metrics_dir = os.getenv(
+            "METRICS_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metrics")
+        )
+        self.prometheus_textfile = os.getenv("PROMETHEUS_TEXTFILE")  # .prom file for the node_exporter textfile collector
\ No newline at end of file
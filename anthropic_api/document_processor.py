@@ -1,140 +1,577 @@
+import asyncio
 import datetime
+import glob
 import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from checkpoint import RunCheckpoint
+from input_reader import InputReader, STDIN
+from retry import RetryBudget
+from section_parser import SectionParser
+
+class CombinationGroups:
+    # Packs consecutive expanded sections into combination groups: a section
+    # that would take the open group over the token budget, or that comes from
+    # another chunk, closes it and starts the next one. A group never straddles
+    # two chunks.
+    def __init__(self, token_counter, token_budget):
+        self.token_counter = token_counter
+        self.token_budget = token_budget
+        self.group = []
+        self.group_tokens = 0
+    
+    def add(self, section):
+        # Returns the group the section closed, or None
+        tokens = self.token_counter.count_tokens(section['expanded_content'])
+        closed = None
+        if self.group and (self.group_tokens + tokens > self.token_budget or section.get('chunk') != self.group[-1].get('chunk')):
+            closed = self.close()
+        self.group.append(section)
+        self.group_tokens += tokens
+        return closed
+    
+    def close(self):
+        # Returns the open group, or None if it is empty
+        group = self.group
+        self.group = []
+        self.group_tokens = 0
+        return group or None
 
 class DocumentProcessor:
-    def __init__(self, config, token_counter, text_chunker, claude_client):
+    # The instructions are the same for every call of a step, so they go in the
+    # system prompt, where the provider can cache them; only the text to work
+    # on changes from call to call and goes in the user message.
+    SECTION_INSTRUCTIONS = """
+        Dela upp texten i användarens meddelande i logiska sektioner. För varje sektion, ge en beskrivande rubrik.
+        Meddelandet anger vilken del av hela dokumentet texten är.
+        
+        Formatera ditt svar enligt följande:
+        - Första raden: Övergripande dokumenttitel
+        - För varje sektion:
+          SECTION: Sektionsrubrik
+          Innehållet i sektionen...
+        """
+    
+    EXPANSION_INSTRUCTIONS = """
+        Expandera sektionen i användarens meddelande till en mycket mer detaljerad version. Behåll så mycket som möjligt av originalinnehållet, inklusive all relevant information, exempel, och specifika detaljer. Det är viktigt att bevara strukturen och ordningen i originalinnehållet. Lägg till förklaringar där det behövs för att förtydliga koncept.
+        
+        Formatera ditt svar enligt följande:
+        EXPANDED_CONTENT:
+        Den expanderade, detaljerade texten här...
+        """
+    
+    COMBINATION_INSTRUCTIONS = """
+        Kombinera de expanderade sektionerna i användarens meddelande till en sammanhängande del av dokumentet. 
+        Gör minimala ändringar för att få texten att flyta naturligt, men behåll så mycket detaljerad information som möjligt. 
+        Undvik att komprimera eller sammanfatta för mycket.
+        
+        Formatera ditt svar enligt följande:
+        PARTIAL_DOCUMENT:
+        Den kombinerade, sammanhängande texten för denna del...
+        """
+    
+    def __init__(self, config, token_counter, text_chunker, client, batch_backend=None, metrics=None, input_reader=None):
         self.config = config
         self.token_counter = token_counter
         self.text_chunker = text_chunker
-        self.claude_client = claude_client
+        self.client = client
+        # With a batch backend, every prompt of a stage is submitted as one
+        # Message Batches job instead of one request at a time.
+        self.batch_backend = batch_backend
+        self.metrics = metrics
+        self.input_reader = input_reader or InputReader(
+            config.input_block_size, config.input_fallback_encoding, config.stream_input_mb
+        )
+        self._local = threading.local()
     
     def parse_section_response(self, response_text):
-        lines = response_text.strip().split('\n')
-        document_title = lines[0].strip()
-        sections = []
-        current_section = None
-        
-        for line in lines[1:]:
-            if line.startswith('SECTION:'):
-                if current_section:
-                    sections.append(current_section)
-                current_section = {'title': line[8:].strip(), 'content': ''}
-            elif current_section:
-                current_section['content'] += line + '\n'
-                
-        if current_section:
-            sections.append(current_section)
-            
-        return document_title, sections
+        return SectionParser.parse(response_text)
     
-    def split_into_sections(self, text):
-        chunks = self.text_chunker.chunk_text(text)
+    def split_into_sections(self, text, checkpoint=None):
+        # The stages only run one after the other with a batch backend, so
+        # every chunk still to split goes in one message batch
+        with self._stage("chunk"):
+            chunks = self._chunk_text(text, checkpoint)
         all_sections = []
         document_title = ""
         
         print(f"Text split into {len(chunks)} chunks for processing")
         
-        for i, chunk in enumerate(chunks):
-            print(f"\nProcessing chunk {i+1} of {len(chunks)}...")
-            
-            prompt = self._create_section_prompt(chunk, i+1, len(chunks))
-            response_text = self.claude_client.create_message(prompt)
-            
-            chunk_title, chunk_sections = self.parse_section_response(response_text)
-            if not document_title:
-                document_title = chunk_title
-            
-            all_sections.extend(chunk_sections)
-            print(f"Chunk {i+1} processed. Sections in this chunk: {len(chunk_sections)}")
+        keys = [RunCheckpoint.fingerprint(chunk) for chunk in chunks]
+        splits = [checkpoint.load("split", key) if checkpoint else None for key in keys]
+        pending = [i for i, saved in enumerate(splits) if saved is None]
+        prompts = [self._create_section_prompt(chunks[i], i+1, len(chunks)) for i in pending]
+        for i, response_text in zip(pending, self._run_batch(prompts, self.SECTION_INSTRUCTIONS, "chunk splits")):
+            parsed = self._parse_batch_result(self.parse_section_response, response_text)
+            if parsed is not None:
+                chunk_title, chunk_sections = parsed
+                splits[i] = {'document_title': chunk_title, 'sections': chunk_sections}
+                if checkpoint:
+                    checkpoint.save("split", keys[i], splits[i])
+        self._raise_if_incomplete(splits, "chunk splits")
+        
+        # The first chunk names the document, so its title is known as soon as
+        # that chunk is split
+        if splits:
+            document_title = splits[0]['document_title']
+        for i, split in enumerate(splits):
+            # Remember which chunk each section came from, so combination groups
+            # never straddle two chunks and an edit stays local to its chunk.
+            for section in split['sections']:
+                section['chunk'] = i
+            all_sections.extend(split['sections'])
+            print(f"Chunk {i+1} processed. Sections in this chunk: {len(split['sections'])}")
         
         return {"document_title": document_title, "sections": all_sections}
     
-    def expand_section(self, section, document_title):
+    def _chunk_text(self, text, checkpoint):
+        previous_chunks = checkpoint.load_chunks() if checkpoint and self.config.incremental else None
+        if previous_chunks:
+            chunks = self.text_chunker.rechunk(text, previous_chunks)
+            unchanged = len(set(chunks) & set(previous_chunks))
+            print(f"Incremental run: {unchanged} of {len(chunks)} chunks unchanged since the previous run")
+        else:
+            chunks = self.text_chunker.chunk_text(text)
+        
+        if checkpoint:
+            checkpoint.save_chunks(chunks)
+        return chunks
+    
+    async def expand_section_async(self, section, document_title):
         print(f"Expanding section: {section['title']}")
         prompt = self._create_expansion_prompt(section, document_title)
-        response_text = self.claude_client.create_message(prompt)
+        with self._section(self._section_name(section)):
+            response_text = await self.client.create_message_async(
+                prompt, system=self.EXPANSION_INSTRUCTIONS, output_ratio=self.config.expansion_output_ratio
+            )
+        return self._parse_expansion_response(response_text)
+    
+    def expand_sections(self, sections, document_title, checkpoint=None):
+        keys = [self._expansion_key(section) for section in sections]
+        contents = []
+        for key in keys:
+            saved = checkpoint.load("expanded", key) if checkpoint else None
+            contents.append(saved['expanded_content'] if saved is not None else None)
+        
+        pending = [i for i, content in enumerate(contents) if content is None]
+        prompts = [self._create_expansion_prompt(sections[i], document_title) for i in pending]
+        for i, response_text in zip(pending, self._run_batch(prompts, self.EXPANSION_INSTRUCTIONS, "section expansions")):
+            contents[i] = self._parse_batch_result(self._parse_expansion_response, response_text)
+            if contents[i] is not None and checkpoint:
+                checkpoint.save("expanded", keys[i], {'expanded_content': contents[i]})
+        self._raise_if_incomplete(contents, "section expansions")
         
-        if response_text.startswith("EXPANDED_CONTENT:"):
-            return response_text[18:].strip()
+        return [
+            {
+                'title': section['title'],
+                'expanded_content': content,
+                'chunk': section.get('chunk')
+            }
+            for section, content in zip(sections, contents)
+        ]
+    
+    async def _expand_checkpointed(self, section, document_title, checkpoint, semaphore):
+        # Each finished expansion is saved right away so a failure elsewhere does not lose it
+        key = self._expansion_key(section)
+        saved = checkpoint.load("expanded", key) if checkpoint else None
+        
+        if saved is not None:
+            expanded_content = saved['expanded_content']
         else:
-            raise ValueError("Unexpected response format")
+            with self._label("expand"):
+                async with semaphore:
+                    expanded_content = await self.expand_section_async(section, document_title)
+            if checkpoint:
+                checkpoint.save("expanded", key, {'expanded_content': expanded_content})
+        
+        return {
+            'title': section['title'],
+            'expanded_content': expanded_content,
+            'chunk': section.get('chunk')
+        }
+    
+    def _expansion_key(self, section):
+        # The document title is left out: it comes from the first chunk, and
+        # an edit there must not invalidate every expansion in the document
+        return RunCheckpoint.fingerprint(section['title'], section['content'])
+    
+    def _parse_expansion_response(self, response_text):
+        return self._strip_marker(response_text, "EXPANDED_CONTENT")
+    
+    def _parse_combination_response(self, response_text):
+        return self._strip_marker(response_text, "PARTIAL_DOCUMENT")
+    
+    def _strip_marker(self, response_text, marker):
+        # The marker may be wrapped in markdown, followed by text on the same
+        # line or missing; only an empty response is an error
+        match = re.match(rf"[\s#*_]*{marker}[*_]*\s*:[*_]*", response_text)
+        text = response_text[match.end():].strip() if match else response_text.strip()
+        if not text:
+            raise ValueError("Empty response")
+        if not match:
+            print(f"The response has no {marker}: line. Using all of it.")
+        return text
+    
+    def _run_batch(self, prompts, system, description):
+        if not prompts:
+            return []
+        print(f"Submitting {len(prompts)} {description} as a message batch...")
+        return self.batch_backend.run(prompts, system)
     
-    def combine_sections(self, expanded_sections, document_title):
-        final_document = ""
-        chunk_size = 10
+    def _parse_batch_result(self, parse, response_text):
+        # A failed or malformed response only fails its own request, so every
+        # result after it in the batch is still saved
+        if response_text is None:
+            return None
+        try:
+            return parse(response_text)
+        except ValueError as e:
+            print(f"Unusable response in the message batch: {str(e)}")
+            return None
+    
+    def _raise_if_incomplete(self, results, description):
+        missing = sum(1 for result in results if result is None)
+        if missing:
+            raise RuntimeError(f"{missing} {description} failed in the message batch")
+    
+    def combine_sections(self, expanded_sections, document_title, checkpoint=None, on_partial=None):
+        # With on_partial, every partial document is handed over as soon as it is
+        # ready instead of being collected, so the full document is never in memory.
+        groups = list(self._combination_groups(expanded_sections))
+        keys = [self._combination_key(group) for group in groups]
+        partial_documents = []
+        emit = on_partial or partial_documents.append
         
-        while expanded_sections:
-            sections_chunk = expanded_sections[:chunk_size]
-            prompt = self._create_combination_prompt(sections_chunk, document_title)
-            
-            response_text = self.claude_client.create_message(prompt)
-            
-            if response_text.startswith("PARTIAL_DOCUMENT:"):
-                partial_document = response_text[18:].strip()
-                final_document += partial_document + "\n\n"
-                expanded_sections = expanded_sections[len(sections_chunk):]
+        partials = self._combine_in_batch(groups, keys, document_title, checkpoint)
+        for key in keys:
+            emit(partials[key])
+        
+        return "\n\n".join(partial_documents)
+    
+    async def _combine_checkpointed(self, group, key, document_title, checkpoint, semaphore):
+        saved = checkpoint.load("combined", key) if checkpoint else None
+        if saved is not None:
+            return saved['partial_document']
+        
+        prompt = self._create_combination_prompt(group, document_title)
+        with self._label("combine"), self._section(self._group_name(group)):
+            async with semaphore:
+                response_text = await self.client.create_message_async(
+                    prompt, system=self.COMBINATION_INSTRUCTIONS, output_ratio=self.config.combination_output_ratio
+                )
+        partial_document = self._parse_combination_response(response_text)
+        if checkpoint:
+            checkpoint.save("combined", key, {'partial_document': partial_document})
+        return partial_document
+    
+    def _combine_in_batch(self, groups, keys, document_title, checkpoint):
+        partials = {}
+        pending = []
+        for group, key in zip(groups, keys):
+            saved = checkpoint.load("combined", key) if checkpoint else None
+            if saved is not None:
+                partials[key] = saved['partial_document']
             else:
-                raise ValueError("Unexpected response format")
+                pending.append((group, key))
         
-        return final_document.strip()
+        prompts = [self._create_combination_prompt(group, document_title) for group, _ in pending]
+        for (group, key), response_text in zip(pending, self._run_batch(prompts, self.COMBINATION_INSTRUCTIONS, "section combinations")):
+            partial_document = self._parse_batch_result(self._parse_combination_response, response_text)
+            if partial_document is not None:
+                partials[key] = partial_document
+                if checkpoint:
+                    checkpoint.save("combined", key, {'partial_document': partial_document})
+        self._raise_if_incomplete([partials.get(key) for key in keys], "section combinations")
+        return partials
     
-    def process_document(self, file_path):
-        try:
-            print(f"\nReading file: {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-            
-            print("\nStep 1: Splitting the document into sections...")
-            document_structure = self.split_into_sections(text)
-            
-            print("\nStep 2: Expanding each section...")
-            expanded_sections = []
-            for i, section in enumerate(document_structure['sections'], 1):
-                expanded_content = self.expand_section(section, document_structure['document_title'])
-                expanded_sections.append({
-                    'title': section['title'],
-                    'expanded_content': expanded_content
-                })
+    def _combination_key(self, group):
+        return RunCheckpoint.fingerprint([
+            (section['title'], section['expanded_content']) for section in group
+        ])
+    
+    def _combination_groups(self, expanded_sections):
+        groups = CombinationGroups(self.token_counter, self.config.combine_token_budget)
+        for section in expanded_sections:
+            group = groups.add(section)
+            if group:
+                yield group
+        group = groups.close()
+        if group:
+            yield group
+    
+    async def _split_chunk_async(self, chunk, index, total, checkpoint, semaphore):
+        key = RunCheckpoint.fingerprint(chunk)
+        saved = checkpoint.load("split", key) if checkpoint else None
+        number = f"{index+1} of {total}" if total else f"{index+1}"
+        if saved is not None:
+            print(f"\nChunk {number} split")
+            chunk_title, chunk_sections = saved['document_title'], saved['sections']
+        else:
+            print(f"\nProcessing chunk {number}...")
+            prompt = self._create_section_prompt(chunk, index+1, total)
+            with self._label("split"), self._section(f"Chunk {index+1}"):
+                async with semaphore:
+                    response_text = await self.client.create_message_async(
+                        prompt, system=self.SECTION_INSTRUCTIONS, output_ratio=self.config.split_output_ratio
+                    )
+            chunk_title, chunk_sections = self.parse_section_response(response_text)
+            if checkpoint:
+                checkpoint.save("split", key, {'document_title': chunk_title, 'sections': chunk_sections})
+        
+        for section in chunk_sections:
+            section['chunk'] = index
+        print(f"Chunk {number} processed. Sections in this chunk: {len(chunk_sections)}")
+        return chunk_title, chunk_sections
+    
+    async def _process_pipelined(self, chunks, checkpoint, emit):
+        # Splitting, expansion and combination overlap instead of waiting for
+        # each other: a chunk's sections are expanded as soon as the chunk is
+        # split, and a combination group starts as soon as its sections are
+        # expanded. Every stage shares one limit of max_concurrent_requests.
+        # Partials are still emitted in document order. chunks may be a lazy
+        # iterator; it is read at most 2 * max_concurrent_requests chunks ahead
+        # of the output, so a long input is never in memory at once.
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_requests)
+        read_ahead = 2 * self.config.max_concurrent_requests
+        total = len(chunks) if isinstance(chunks, list) else None
+        tasks = set()
+        room = asyncio.Condition()
+        in_flight = 0
+        ready_chunks = asyncio.Queue()
+        
+        def finished(task):
+            # Finished tasks are dropped, so their results can be freed once used
+            tasks.discard(task)
+            if not task.cancelled():
+                task.exception()
+        
+        def start(coroutine):
+            task = asyncio.ensure_future(coroutine)
+            tasks.add(task)
+            task.add_done_callback(finished)
+            return task
+        
+        async def find_document_title(split):
+            # The first chunk's title, as in split_into_sections
+            chunk_title, _ = await split
+            return chunk_title
+        
+        async def combine_chunk(split, title):
+            # Expansion prompts carry the document title, so they wait for it
+            document_title = await title
+            _, sections = await split
+            expansions = [start(self._expand_checkpointed(section, document_title, checkpoint, semaphore)) for section in sections]
             
-            print("\nStep 3: Combining sections into final document...")
-            final_document = self.combine_sections(expanded_sections, document_structure['document_title'])
+            combinations = []
+            groups = CombinationGroups(self.token_counter, self.config.combine_token_budget)
+            for expansion in expansions:
+                group = groups.add(await expansion)
+                if group:
+                    combinations.append(start(self._combine_group(group, document_title, checkpoint, semaphore)))
+            group = groups.close()
+            if group:
+                combinations.append(start(self._combine_group(group, document_title, checkpoint, semaphore)))
+            return combinations
+        
+        async def read_chunks():
+            nonlocal in_flight
+            loop = asyncio.get_running_loop()
+            iterator = iter(chunks)
+            index = 0
+            title = None
+            try:
+                while True:
+                    async with room:
+                        await room.wait_for(lambda: in_flight < read_ahead)
+                    # Reading and chunking the input runs outside the event loop
+                    chunk = await loop.run_in_executor(None, next, iterator, None)
+                    if chunk is None:
+                        break
+                    split = start(self._split_chunk_async(chunk, index, total, checkpoint, semaphore))
+                    if title is None:
+                        title = start(find_document_title(split))
+                    ready_chunks.put_nowait(start(combine_chunk(split, title)))
+                    in_flight += 1
+                    index += 1
+            finally:
+                ready_chunks.put_nowait(None)
+        
+        reader = start(read_chunks())
+        try:
+            while True:
+                chunk_task = await ready_chunks.get()
+                if chunk_task is None:
+                    break
+                for combination in await chunk_task:
+                    emit(await combination)
+                async with room:
+                    in_flight -= 1
+                    room.notify_all()
+            await reader
+        finally:
+            # On failure, stop reading and let the work already started finish
+            # so it is checkpointed. Running tasks can start new ones, so wait
+            # until none are left.
+            reader.cancel()
+            while tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _combine_group(self, group, document_title, checkpoint, semaphore):
+        key = self._combination_key(group)
+        return self._combine_checkpointed(group, key, document_title, checkpoint, semaphore)
+    
+    def process_document(self, file_path, run_id=None):
+        # run_id, e.g. a service job's id, is added to the output and report
+        # file names, so runs of the same file never write to the same files.
+        # Every API call made for this document draws on the same retry budget.
+        budget = RetryBudget(self.config.document_deadline_seconds, self.config.document_retry_budget)
+        with budget.scope():
+            if self.metrics is None:
+                return self._process_document(file_path, run_id)
+            # Each run's calls are kept apart from other runs of the same file
+            run = run_id or uuid.uuid4().hex[:12]
+            with self.metrics.run(run):
+                try:
+                    return self._process_document(file_path, run_id)
+                finally:
+                    self._write_metrics(file_path, run, run_id)
+                    self.metrics.finish_run(run)
+    
+    def _process_document(self, file_path, run_id=None):
+        checkpoint = None
+        try:
+            source = "standard input" if file_path == STDIN else f"file: {file_path}"
+            print(f"\nReading {source}")
             
-            self._save_document(final_document, file_path)
-            return final_document
+            # Input from a pipe cannot be read again, so there is nothing to resume
+            if self.config.resume_runs and file_path != STDIN:
+                checkpoint = RunCheckpoint(self.config.runs_dir, file_path)
+                print(f"Saving progress to: {checkpoint.run_dir}")
             
+            output_path = self._output_path(file_path, run_id)
+            if self.batch_backend:
+                with self._stage("read"):
+                    text = self.input_reader.read_text(file_path)
+                self._process_in_stages(text, checkpoint, output_path)
+            else:
+                if self.input_reader.streams(file_path):
+                    # Read, chunked and processed a block at a time; incremental
+                    # re-chunking needs the whole text, so it is skipped
+                    print("Chunking the input while it is read")
+                    chunks = self.text_chunker.iter_chunks(self.input_reader.read_blocks(file_path))
+                else:
+                    with self._stage("read"):
+                        text = self.input_reader.read_text(file_path)
+                    with self._stage("chunk"):
+                        chunks = self._chunk_text(text, checkpoint)
+                    print(f"Text split into {len(chunks)} chunks for processing")
+                
+                print("\nSplitting, expanding and combining sections as they become ready...")
+                with self._stage("pipeline"):
+                    with self._document_writer(output_path) as write_partial:
+                        self._run(self._process_pipelined(chunks, checkpoint, write_partial))
+            print(f"Document saved to: {output_path}")
+            if checkpoint:
+                checkpoint.prune()
+                saved_calls = checkpoint.saved_calls()
+                if saved_calls:
+                    print(f"Reused {saved_calls} results from earlier runs ({checkpoint.reused['split']} splits, "
+                          f"{checkpoint.reused['expanded']} expansions, {checkpoint.reused['combined']} combinations) "
+                          f"instead of calling the API")
+            return output_path
+        
         except Exception as e:
             print(f"Error processing document: {str(e)}")
+            if checkpoint:
+                print("Completed steps are saved. Run the document again to resume.")
             return None
     
+    def _process_in_stages(self, text, checkpoint, output_path):
+        # Message batches need every prompt of a stage up front, so the stages
+        # run one after the other
+        print("\nStep 1: Splitting the document into sections...")
+        with self._stage("split"):
+            document_structure = self.split_into_sections(text, checkpoint)
+        
+        print("\nStep 2: Expanding each section...")
+        with self._stage("expand"):
+            expanded_sections = self.expand_sections(document_structure['sections'], document_structure['document_title'], checkpoint)
+        
+        print("\nStep 3: Combining sections into final document...")
+        with self._stage("combine"):
+            with self._document_writer(output_path) as write_partial:
+                self.combine_sections(expanded_sections, document_structure['document_title'], checkpoint, write_partial)
+    
+    def _run(self, coroutine):
+        # asyncio.run starts a new event loop, and the clients then open new
+        # connections, for every document. A long-running service keeps one
+        # loop per thread instead, so connection pools stay warm.
+        if not self.config.persistent_event_loops:
+            return asyncio.run(coroutine)
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(coroutine)
+    
+    def _stage(self, name):
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.stage(name)
+    
+    def _label(self, name):
+        # Attributes API calls to a stage without timing it, for stages that overlap
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.label(name)
+    
+    def _section(self, name):
+        # Attributes API calls to a section, for per-section token usage
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.section(name)
+    
+    @staticmethod
+    def _section_name(section):
+        chunk = section.get('chunk')
+        return section['title'] if chunk is None else f"Chunk {chunk+1}: {section['title']}"
+    
+    def _group_name(self, group):
+        if len(group) == 1:
+            return self._section_name(group[0])
+        return f"{self._section_name(group[0])} - {group[-1]['title']}"
+    
+    def _write_metrics(self, file_path, run, run_id=None):
+        # One JSON report per run, plus the process-wide totals for Prometheus
+        report_path = os.path.join(self.config.metrics_dir, self._file_name(file_path, "", run_id) + ".json")
+        try:
+            self.metrics.write_json(report_path, run=run)
+            print(f"Run metrics saved to: {report_path}")
+            if self.config.prometheus_textfile:
+                self.metrics.write_prometheus(self.config.prometheus_textfile)
+        except OSError as e:
+            print(f"Could not write run metrics: {str(e)}")
+    
     def _create_section_prompt(self, chunk, current_chunk, total_chunks):
+        # While the input is still being read the number of chunks is not known
+        part = f"{current_chunk} av {total_chunks}" if total_chunks else f"{current_chunk}"
         return f"""
-        Dela upp följande text i logiska sektioner. För varje sektion, ge en beskrivande rubrik.
-        Detta är del {current_chunk} av {total_chunks} av hela dokumentet.
+        Detta är del {part} av hela dokumentet.
         
-        Formatera ditt svar enligt följande:
-        - Första raden: Övergripande dokumenttitel
-        - För varje sektion:
-          SECTION: Sektionsrubrik
-          Innehållet i sektionen...
-
         Här är texten att bearbeta:
-
+        
         {chunk}
         """
     
     def _create_expansion_prompt(self, section, document_title):
         return f"""
-        Expandera följande sektion till en mycket mer detaljerad version. Behåll så mycket som möjligt av originalinnehållet, inklusive all relevant information, exempel, och specifika detaljer. Det är viktigt att bevara strukturen och ordningen i originalinnehållet. Lägg till förklaringar där det behövs för att förtydliga koncept.
-
         Dokumenttitel: {document_title}
         Sektionsrubrik: {section['title']}
-
+        
         Originaltext:
         {section['content']}
-
-        Formatera ditt svar enligt följande:
-        EXPANDED_CONTENT:
-        Den expanderade, detaljerade texten här...
         """
     
     def _create_combination_prompt(self, sections, document_title):
@@ -144,25 +581,48 @@ class DocumentProcessor:
         ])
         
         return f"""
-        Kombinera följande expanderade sektioner till en sammanhängande del av dokumentet. 
-        Gör minimala ändringar för att få texten att flyta naturligt, men behåll så mycket detaljerad information som möjligt. 
-        Undvik att komprimera eller sammanfatta för mycket.
-
         Dokumenttitel: {document_title}
-
+        
         {sections_text}
-
-        Formatera ditt svar enligt följande:
-        PARTIAL_DOCUMENT:
-        Den kombinerade, sammanhängande texten för denna del...
         """
     
-    def _save_document(self, final_document, original_file_path):
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    @staticmethod
+    def find_output(original_file_path):
         base_name = os.path.splitext(os.path.basename(original_file_path))[0]
-        output_file_path = f"{os.path.dirname(original_file_path)}/{base_name}_processed_{timestamp}.txt"
+        pattern = os.path.join(glob.escape(os.path.dirname(original_file_path)), f"{glob.escape(base_name)}_processed_*.txt")
+        outputs = sorted(glob.glob(pattern))
+        return outputs[-1] if outputs else None
+    
+    def _output_path(self, original_file_path, run_id=None):
+        # Input from standard input is saved in the working directory
+        file_name = self._file_name(original_file_path, "_processed", run_id) + ".txt"
+        return os.path.join(os.path.dirname(original_file_path), file_name)
+    
+    @staticmethod
+    def _file_name(file_path, suffix, run_id=None):
+        # <input name><suffix>_<timestamp>, then _<run_id> if there is one
+        base_name = "stdin" if file_path == STDIN else os.path.splitext(os.path.basename(file_path))[0]
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{base_name}{suffix}_{timestamp}_{run_id}" if run_id else f"{base_name}{suffix}_{timestamp}"
+    
+    @contextmanager
+    def _document_writer(self, output_file_path):
+        # Partial documents are appended to a temporary file as soon as they are
+        # combined; the file only gets its final name once the document is complete.
+        temporary_path = output_file_path + ".partial"
+        separator = ""
         
-        with open(output_file_path, 'w', encoding='utf-8') as output_file:
-            output_file.write(final_document)
+        def write_partial(partial_document):
+            nonlocal separator
+            output_file.write(separator + partial_document)
+            output_file.flush()
+            separator = "\n\n"
         
-        print(f"Document saved to: {output_file_path}")
\ No newline at end of file
+        try:
+            with open(temporary_path, 'w', encoding='utf-8') as output_file:
+                yield write_partial
+            os.replace(temporary_path, output_file_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
\ No newline at end of file
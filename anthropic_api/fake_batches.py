@@ -0,0 +1,52 @@
+import itertools
+from types import SimpleNamespace
+
+class FakeMessageBatches:
+    # Stands in for client.messages.batches without any network access. Each
+    # batch ends after `polls_until_done` retrieve() calls, and every request is
+    # answered by responder(params), which returns the response text or raises
+    # to mark the request as errored.
+    def __init__(self, responder, polls_until_done=1):
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        self.batches = {}
+        self.ids = itertools.count(1)
+    
+    def create(self, requests):
+        batch_id = f"msgbatch_fake_{next(self.ids)}"
+        self.batches[batch_id] = {"requests": list(requests), "polls": 0}
+        return self._status(batch_id)
+    
+    def retrieve(self, batch_id):
+        self.batches[batch_id]["polls"] += 1
+        return self._status(batch_id)
+    
+    def results(self, batch_id):
+        for request in self.batches[batch_id]["requests"]:
+            try:
+                text = self.responder(request["params"])
+            except Exception as e:
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(message=str(e)))
+            else:
+                message = SimpleNamespace(
+                    content=[SimpleNamespace(type="text", text=text)],
+                    stop_reason="end_turn"
+                )
+                result = SimpleNamespace(type="succeeded", message=message)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+    
+    def _status(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = batch["polls"] >= self.polls_until_done
+        total = len(batch["requests"])
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status="ended" if ended else "in_progress",
+            request_counts=SimpleNamespace(
+                processing=0 if ended else total,
+                succeeded=total if ended else 0,
+                errored=0,
+                canceled=0,
+                expired=0
+            )
+        )
@@ -0,0 +1,66 @@
+import asyncio
+
+from base_client import LLMClient
+
+class FakeClient(LLMClient):
+    # Answers the pipeline's prompts locally, in the same text protocol as the
+    # real models, without any network access: splitting returns a section per
+    # paragraph, expansion repeats the original text and combination joins the
+    # sections. Runs through the same cache, rate limiter and retries as the
+    # real clients. Useful for trying out the pipeline and for benchmarks.
+    def __init__(self, config, rate_limiter, token_counter=None, cache=None, metrics=None, latency=None):
+        super().__init__(config, rate_limiter, token_counter, cache, metrics)
+        self.model = "fake"
+        self.max_tokens = config.max_tokens
+        self.latency = config.fake_latency if latency is None else latency
+        self.calls = 0
+        self.cached_systems = set()
+    
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        await asyncio.sleep(self.latency)
+        return self._respond(prompt, on_text, system, max_tokens, prefill)
+    
+    def _create_async_client(self):
+        return None
+    
+    def _respond(self, prompt, on_text, system=None, max_tokens=None, prefill=None):
+        self.calls += 1
+        if "Här är texten att bearbeta:" in prompt:
+            text = self._split_response(prompt)
+        elif "Originaltext:" in prompt:
+            text = "EXPANDED_CONTENT:\n" + self._after(prompt, "Originaltext:")
+        else:
+            text = "PARTIAL_DOCUMENT:\n" + self._after(prompt, "Dokumenttitel:").split("\n", 1)[-1].strip()
+        
+        # Like a real model, continue after the prefill and stop at max_tokens,
+        # writing about four characters per token
+        if prefill and text.startswith(prefill):
+            text = text[len(prefill):]
+        cut_off = max_tokens is not None and len(text) > max_tokens * 4
+        if cut_off:
+            text = text[:max_tokens * 4]
+        
+        if on_text:
+            on_text(text)
+        usage = self._usage(self._estimate_tokens(prompt), self._estimate_tokens(text))
+        if system:
+            # Like prompt caching: the first call with a system prompt writes
+            # it to the cache and later calls read it from there
+            field = "cache_read_input_tokens" if system in self.cached_systems else "cache_creation_input_tokens"
+            self.cached_systems.add(system)
+            usage[field] = self._estimate_tokens(system)
+        return text, usage, cut_off
+    
+    def _split_response(self, prompt):
+        text = prompt.split("Här är texten att bearbeta:", 1)[1].strip()
+        paragraphs = [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()] or [text]
+        lines = ["Fake document"]
+        for i, paragraph in enumerate(paragraphs, 1):
+            lines.append(f"SECTION: Del {i}")
+            lines.append(paragraph)
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _after(text, start):
+        # The text to work on runs to the end of the user message
+        return text.split(start, 1)[-1].strip()
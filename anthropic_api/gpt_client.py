@@ -0,0 +1,76 @@
+from openai import AsyncOpenAI
+
+from base_client import LLMClient
+
+class GPTClient(LLMClient):
+    # OpenAI chat completions behind the same interface as ClaudeClient, so the
+    # whole pipeline (chunking, caching, rate limiting, concurrency) applies.
+    CONTINUE_PROMPT = "Fortsätt exakt där svaret slutade, utan att upprepa något."
+    # The continuation is a new reply, so the text so far keeps its whitespace
+    CONTINUES_PREFILL = False
+    
+    def __init__(self, config, rate_limiter, token_counter=None, cache=None, metrics=None):
+        super().__init__(config, rate_limiter, token_counter, cache, metrics)
+        self.model = config.openai_model
+        self.max_tokens = config.openai_max_tokens
+    
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        if self.config.stream_responses:
+            stream = await self._async_client().chat.completions.create(**self._completion_params(prompt, system, max_tokens, prefill, stream=True))
+            parts = []
+            usage = None
+            finish_reason = None
+            async for chunk in stream:
+                text = self._chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    if on_text:
+                        on_text(text)
+                usage = chunk.usage or usage
+                finish_reason = self._finish_reason(chunk) or finish_reason
+            return "".join(parts), self._response_usage(usage), finish_reason == "length"
+        
+        response = await self._async_client().chat.completions.create(**self._completion_params(prompt, system, max_tokens, prefill))
+        choice = response.choices[0]
+        return choice.message.content or "", self._response_usage(response.usage), choice.finish_reason == "length"
+    
+    def _create_async_client(self):
+        return AsyncOpenAI(api_key=self.config.openai_api_key, max_retries=0)
+    
+    def _completion_params(self, prompt, system=None, max_tokens=None, prefill=None, stream=False):
+        # OpenAI caches long shared prompt prefixes automatically, so the
+        # system message only has to come first
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        if prefill:
+            # Chat completions cannot continue an assistant message directly,
+            # so the model is asked to pick up where its answer stopped
+            messages.append({"role": "assistant", "content": prefill})
+            messages.append({"role": "user", "content": self.CONTINUE_PROMPT})
+        params = {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "messages": messages
+        }
+        if stream:
+            params["stream"] = True
+            params["stream_options"] = {"include_usage": True}
+        return params
+    
+    @staticmethod
+    def _finish_reason(chunk):
+        return chunk.choices[0].finish_reason if chunk.choices else None
+    
+    @staticmethod
+    def _chunk_text(chunk):
+        if chunk.choices and chunk.choices[0].delta.content:
+            return chunk.choices[0].delta.content
+        return None
+    
+    def _response_usage(self, usage):
+        # prompt_tokens includes the cached tokens; input_tokens does not, as with Claude
+        if usage is None:
+            return self._usage()
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        return self._usage(usage.prompt_tokens - cached, usage.completion_tokens, cached)
@@ -0,0 +1,85 @@
+import codecs
+import os
+import sys
+
+# In place of a file path, "-" reads the transcript from standard input
+STDIN = "-"
+# Longest first, so a UTF-32 mark is not taken for a UTF-16 one
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+class InputReader:
+    # Reads a transcript from a file or a pipe in blocks, so a large one never
+    # has to be in memory at once. The encoding comes from a byte order mark,
+    # or else is UTF-8. Input that turns out not to be UTF-8 before any
+    # non-ASCII text was read is decoded with the fallback encoding instead;
+    # later invalid bytes are replaced. Line endings become "\n", as with open().
+    def __init__(self, block_size=1024 * 1024, fallback_encoding="cp1252", stream_input_mb=20):
+        self.block_size = block_size
+        self.fallback_encoding = fallback_encoding
+        self.stream_threshold = stream_input_mb * 1024 * 1024
+    
+    def streams(self, path):
+        # Whether the input is chunked while it is read instead of read whole
+        return path == STDIN or os.path.getsize(path) > self.stream_threshold
+    
+    def read_text(self, path):
+        return "".join(self.read_blocks(path))
+    
+    def read_blocks(self, path):
+        if path == STDIN:
+            yield from self._decode(sys.stdin.buffer)
+        else:
+            with open(path, "rb") as file:
+                yield from self._decode(file)
+    
+    def _decode(self, file):
+        # Enough for the longest byte order mark
+        data = file.read(max(self.block_size, 4))
+        encoding = self._marked_encoding(data) or "utf-8"
+        decoder = codecs.getincrementaldecoder(encoding)("strict")
+        only_ascii = True
+        pending_cr = ""
+        
+        while True:
+            final = not data
+            try:
+                text = decoder.decode(data, final)
+            except UnicodeDecodeError as e:
+                # e.start counts the bytes the decoder held back from the previous block
+                held = decoder.getstate()[0]
+                if encoding == "utf-8" and only_ascii and (held + data)[:e.start].isascii():
+                    # Nothing read so far differs between the two encodings
+                    print(f"The input is not UTF-8. Reading it as {self.fallback_encoding}.")
+                    encoding = self.fallback_encoding
+                    decoder = codecs.getincrementaldecoder(encoding)("replace")
+                    data = held + data
+                else:
+                    print(f"The input has bytes that are not valid {encoding}. Replacing them.")
+                    decoder.errors = "replace"
+                text = decoder.decode(data, final)
+            only_ascii = only_ascii and text.isascii()
+            
+            # A "\r" at the end of a block may be the first half of "\r\n"
+            text = pending_cr + text
+            pending_cr = ""
+            if text.endswith("\r") and not final:
+                text, pending_cr = text[:-1], "\r"
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+            if text:
+                yield text
+            if final:
+                return
+            data = file.read(self.block_size)
+    
+    @staticmethod
+    def _marked_encoding(data):
+        for mark, encoding in BYTE_ORDER_MARKS:
+            if data.startswith(mark):
+                return encoding
+        return None
@@ -0,0 +1,179 @@
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job:
+    def __init__(self, path, name=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.status = QUEUED
+        self.output_path = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "path": self.path,
+            "status": self.status,
+            "output_path": self.output_path,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": (self.started_at or time.time()) - self.submitted_at,
+            "run_seconds": (self.finished_at or time.time()) - self.started_at if self.started_at else None,
+        }
+
+class JobQueue:
+    # Runs documents submitted to the service on a fixed number of worker
+    # threads, first in first out. Every worker calls the same
+    # process_document(path, job_id), so all jobs share one client, rate
+    # limiter, tokenizer and cache. Jobs for the same file run one at a time,
+    # since they share its checkpoint. Only the last `history` finished jobs
+    # are kept.
+    def __init__(self, process_document, jobs_dir, workers=2, history=1000):
+        self.process_document = process_document
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.history = history
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Per input path: its lock and the number of workers holding or waiting for it
+        self._path_locks = {}
+        self._threads = []
+    
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i+1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+        # Jobs still queued are cancelled; running jobs are finished first
+        with self._lock:
+            for job in self.jobs.values():
+                if job.status == QUEUED:
+                    self._finish(job, CANCELLED)
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def submit_path(self, path):
+        if not os.path.isfile(path):
+            raise ValueError(f"No such file: {path}")
+        return self._submit(Job(os.path.abspath(path)))
+    
+    def submit_text(self, text, name=None):
+        # The transcript is saved in its own directory, where its result is written too
+        name = self._safe_name(name or "transcript")
+        job = Job(None, name)
+        job_dir = os.path.join(self.jobs_dir, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+        job.path = os.path.join(job_dir, name + ".txt")
+        with open(job.path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return self._submit(job)
+    
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+    
+    def cancel(self, job_id):
+        # Only a job that has not started can be cancelled
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            self._finish(job, CANCELLED)
+            return True
+    
+    def counts(self):
+        with self._lock:
+            counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED, 0)
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return counts
+    
+    def _submit(self, job):
+        with self._lock:
+            self.jobs[job.id] = job
+        print(f"Job {job.id} queued: {job.name}")
+        self._queue.put(job)
+        return job
+    
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._path_lock(job.path):
+                self._run(job)
+    
+    def _run(self, job):
+        with self._lock:
+            # The job may have been cancelled while it waited
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        print(f"Job {job.id} started: {job.name}")
+        
+        try:
+            output_path = self.process_document(job.path, job.id)
+            error = None if output_path else "Processing failed; see the service log"
+        except Exception as e:
+            output_path = None
+            error = str(e)
+        
+        with self._lock:
+            job.output_path = output_path
+            job.error = error
+            self._finish(job, DONE if output_path else FAILED)
+        print(f"Job {job.id} {job.status} after {job.finished_at - job.started_at:.1f} s: {job.name}")
+    
+    @contextmanager
+    def _path_lock(self, path):
+        with self._lock:
+            entry = self._path_locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._path_locks[path]
+    
+    def _finish(self, job, status):
+        # Called with the lock held
+        job.status = status
+        job.finished_at = time.time()
+        finished = [other for other in self.jobs.values() if other.status in FINISHED]
+        for old in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[old.id]
+    
+    @staticmethod
+    def _safe_name(name):
+        # Used as a file name, so no directories or unusual characters
+        name = os.path.splitext(os.path.basename(name))[0]
+        return re.sub(r"[^\w.-]+", "_", name).strip("._") or "transcript"
\ No newline at end of file
@@ -1,19 +1,48 @@
 from config import Config
-from tokenizer import TokenCounter
+from tokenizer import get_token_counter
 from rate_limiter import RateLimiter
 from text_processor import TextChunker
-from api_client import ClaudeClient
+from providers import create_client
+from response_cache import ResponseCache
 from document_processor import DocumentProcessor
+from batch_backend import MessageBatchBackend
+from metrics import Metrics
 
-def main():
-    print("Welcome to the Claude Document Processor!")
-    
-    config = Config()
-    token_counter = TokenCounter()
+def create_processor(config):
+    token_counter = get_token_counter(config.tokenizer_backend, config.tokenizer_path)
     rate_limiter = RateLimiter(config)
     text_chunker = TextChunker(token_counter, config)
-    claude_client = ClaudeClient(config, rate_limiter)
-    processor = DocumentProcessor(config, token_counter, text_chunker, claude_client)
+    response_cache = ResponseCache(
+        config.cache_path,
+        config.cache_max_age_days,
+        config.cache_max_size_mb,
+        config.cache_bypass
+    )
+    metrics = Metrics() if config.metrics_enabled else None
+    client = create_client(config, rate_limiter, token_counter, response_cache, metrics)
+    batch_backend = None
+    if config.execution_backend == "batch":
+        if config.provider != "anthropic":
+            raise ValueError("The batch execution backend needs the anthropic provider")
+        batch_backend = MessageBatchBackend(config, cache=response_cache)
+    processor = DocumentProcessor(config, token_counter, text_chunker, client, batch_backend, metrics)
+    return processor, client, response_cache
+
+def print_cache_stats(config, response_cache, client=None):
+    if not config.cache_bypass:
+        stats = response_cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+    if client is not None:
+        usage = client.usage_totals()
+        if usage["cache_read_input_tokens"] or usage["cache_creation_input_tokens"]:
+            print(f"Prompt cache: {Metrics.prompt_cache_hit_rate(usage):.0%} of prompt tokens read from cache "
+                  f"({usage['cache_read_input_tokens']} read, {usage['cache_creation_input_tokens']} written)")
+
+def main():
+    config = Config()
+    print(f"Welcome to the Document Processor ({config.provider})!")
+    
+    processor, client, response_cache = create_processor(config)
     
     file_path = input("Please enter the full path to the document you want to process: ").strip()
     
@@ -30,7 +59,9 @@ def main():
     else:
         print("Processing failed. Please check the error messages above for more details.")
     
+    print_cache_stats(config, response_cache, client)
+    
     input("Press Enter to exit...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
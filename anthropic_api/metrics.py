@@ -0,0 +1,249 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# The pipeline stage, run (document) and section that API calls are attributed
+# to. Context variables follow asyncio tasks, so concurrent expansions keep
+# their stage and section.
+_current_stage = contextvars.ContextVar("stage", default="other")
+_current_run = contextvars.ContextVar("run", default=None)
+_current_section = contextvars.ContextVar("section", default=None)
+
+class Metrics:
+    # Latencies kept per stage of finished runs, for the process-wide p50 and p95
+    LATENCY_WINDOW = 1000
+    
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.calls = []
+        self.stages = []
+        # Per-stage totals of finished runs, whose records have been dropped
+        self.finished = {}
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def run(self, name):
+        token = _current_run.set(name)
+        try:
+            yield
+        finally:
+            _current_run.reset(token)
+    
+    @contextmanager
+    def label(self, name):
+        token = _current_stage.set(name)
+        try:
+            yield
+        finally:
+            _current_stage.reset(token)
+    
+    @contextmanager
+    def section(self, name):
+        token = _current_section.set(name)
+        try:
+            yield
+        finally:
+            _current_section.reset(token)
+    
+    @contextmanager
+    def stage(self, name):
+        token = _current_stage.set(name)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            _current_stage.reset(token)
+            with self.lock:
+                self.stages.append({
+                    "run": _current_run.get(),
+                    "stage": name,
+                    "duration": self.clock() - started,
+                })
+    
+    @contextmanager
+    def call(self):
+        # The caller fills in the yielded record (tokens, retries, throttled
+        # seconds, cache hit) while the call runs; duration and errors are added here.
+        record = {
+            "run": _current_run.get(),
+            "stage": _current_stage.get(),
+            "section": _current_section.get(),
+            "duration": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "retries": 0,
+            "continuations": 0,
+            "throttled": 0.0,
+            "cache_hit": False,
+            "error": None,
+        }
+        started = self.clock()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration"] = self.clock() - started
+            with self.lock:
+                self.calls.append(record)
+    
+    def finish_run(self, run):
+        # Folds a finished run's records into the process-wide totals and drops
+        # them, so a long-running process only keeps records of runs in progress
+        with self.lock:
+            calls = [call for call in self.calls if call["run"] == run]
+            stages = [stage for stage in self.stages if stage["run"] == run]
+            self.calls = [call for call in self.calls if call["run"] != run]
+            self.stages = [stage for stage in self.stages if stage["run"] != run]
+            self._add_records(self.finished, calls, stages)
+            for entry in self.finished.values():
+                del entry["latencies"][:-self.LATENCY_WINDOW]
+    
+    def summary(self, run=None):
+        # One run, or every run so far: finished ones from their totals, without
+        # their per-section usage
+        with self.lock:
+            calls = [call for call in self.calls if run is None or call["run"] == run]
+            stages = [stage for stage in self.stages if run is None or stage["run"] == run]
+            by_stage = {}
+            if run is None:
+                by_stage = {name: dict(entry, latencies=list(entry["latencies"])) for name, entry in self.finished.items()}
+        self._add_records(by_stage, calls, stages)
+        
+        for entry in by_stage.values():
+            latencies = sorted(entry.pop("latencies"))
+            entry["latency_p50"] = self._percentile(latencies, 0.50)
+            entry["latency_p95"] = self._percentile(latencies, 0.95)
+            entry["prompt_cache_hit_rate"] = self.prompt_cache_hit_rate(entry)
+        
+        totals = {
+            name: sum(entry[name] for entry in by_stage.values())
+            for name in ("calls", "cache_hits", "errors", "retries", "continuations", "throttled_seconds", "input_tokens",
+                         "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+        }
+        totals["prompt_cache_hit_rate"] = self.prompt_cache_hit_rate(totals)
+        return {"run": run, "stages": by_stage, "totals": totals, "sections": self._section_usage(calls)}
+    
+    def write_json(self, path, run=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(run), file, ensure_ascii=False, indent=2)
+    
+    def prometheus_text(self):
+        summary = self.summary()
+        metrics = [
+            ("document_processor_stage_seconds_total", "counter", "Wall-clock time spent in each pipeline stage", "duration"),
+            ("document_processor_api_calls_total", "counter", "API calls, including cache hits", "calls"),
+            ("document_processor_cache_hits_total", "counter", "API calls answered from the response cache", "cache_hits"),
+            ("document_processor_api_errors_total", "counter", "API calls that failed after all retries", "errors"),
+            ("document_processor_retries_total", "counter", "Retried API attempts", "retries"),
+            ("document_processor_continuations_total", "counter", "Follow-up requests for responses cut off at max_tokens", "continuations"),
+            ("document_processor_throttled_seconds_total", "counter", "Time spent waiting for the rate limiter", "throttled_seconds"),
+            ("document_processor_input_tokens_total", "counter", "Input tokens reported by the provider", "input_tokens"),
+            ("document_processor_output_tokens_total", "counter", "Output tokens reported by the provider", "output_tokens"),
+            ("document_processor_cache_read_input_tokens_total", "counter", "Input tokens read from the prompt cache", "cache_read_input_tokens"),
+            ("document_processor_cache_creation_input_tokens_total", "counter", "Input tokens written to the prompt cache", "cache_creation_input_tokens"),
+            ("document_processor_api_call_seconds_total", "counter", "Time spent in API calls", "call_seconds"),
+            ("document_processor_api_latency_p95_seconds", "gauge", "95th percentile API call latency", "latency_p95"),
+            ("document_processor_prompt_cache_hit_ratio", "gauge", "Share of prompt tokens read from the prompt cache", "prompt_cache_hit_rate"),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for stage, entry in sorted(summary["stages"].items()):
+                lines.append(f'{name}{{stage="{stage}"}} {entry[field]}')
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path):
+        # Written to a temporary file and renamed, as the node_exporter textfile
+        # collector expects
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temporary_path, path)
+    
+    def _add_records(self, by_stage, calls, stages):
+        for stage in stages:
+            entry = by_stage.setdefault(stage["stage"], self._empty_stage())
+            entry["duration"] += stage["duration"]
+        
+        for call in calls:
+            entry = by_stage.setdefault(call["stage"], self._empty_stage())
+            entry["calls"] += 1
+            entry["cache_hits"] += call["cache_hit"]
+            entry["errors"] += call["error"] is not None
+            entry["retries"] += call["retries"]
+            entry["continuations"] += call["continuations"]
+            entry["throttled_seconds"] += call["throttled"]
+            entry["input_tokens"] += call["input_tokens"]
+            entry["output_tokens"] += call["output_tokens"]
+            entry["cache_read_input_tokens"] += call["cache_read_input_tokens"]
+            entry["cache_creation_input_tokens"] += call["cache_creation_input_tokens"]
+            entry["call_seconds"] += call["duration"]
+            entry["latencies"].append(call["duration"])
+    
+    def _section_usage(self, calls):
+        # Token usage of every section, in the order its calls finished
+        sections = {}
+        for call in calls:
+            if call["section"] is None:
+                continue
+            entry = sections.get((call["stage"], call["section"]))
+            if entry is None:
+                entry = sections[(call["stage"], call["section"])] = {
+                    "stage": call["stage"],
+                    "section": call["section"],
+                    "calls": 0,
+                    "continuations": 0,
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "cache_read_input_tokens": 0,
+                    "cache_creation_input_tokens": 0,
+                }
+            entry["calls"] += 1
+            for field in ("continuations", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+                entry[field] += call[field]
+        return list(sections.values())
+    
+    @staticmethod
+    def _empty_stage():
+        return {
+            "duration": 0.0,
+            "calls": 0,
+            "cache_hits": 0,
+            "errors": 0,
+            "retries": 0,
+            "continuations": 0,
+            "throttled_seconds": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "call_seconds": 0.0,
+            "latencies": [],
+        }
+    
+    @staticmethod
+    def prompt_cache_hit_rate(usage):
+        # Share of all prompt tokens that were read from the provider's prompt cache
+        total = usage["input_tokens"] + usage["cache_read_input_tokens"] + usage["cache_creation_input_tokens"]
+        return usage["cache_read_input_tokens"] / total if total else 0.0
+    
+    @staticmethod
+    def _percentile(values, fraction):
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+        return values[index]
@@ -0,0 +1,25 @@
+# Provider clients by name. Each factory imports its SDK only when it is used,
+# so a provider's package only has to be installed if that provider is chosen.
+
+def _create_claude_client(config, rate_limiter, token_counter, cache, metrics):
+    from api_client import ClaudeClient
+    return ClaudeClient(config, rate_limiter, token_counter, cache, metrics)
+
+def _create_gpt_client(config, rate_limiter, token_counter, cache, metrics):
+    from gpt_client import GPTClient
+    return GPTClient(config, rate_limiter, token_counter, cache, metrics)
+
+def _create_fake_client(config, rate_limiter, token_counter, cache, metrics):
+    from fake_client import FakeClient
+    return FakeClient(config, rate_limiter, token_counter, cache, metrics)
+
+PROVIDERS = {
+    "anthropic": _create_claude_client,
+    "openai": _create_gpt_client,
+    "fake": _create_fake_client,
+}
+
+def create_client(config, rate_limiter, token_counter=None, cache=None, metrics=None):
+    if config.provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider: {config.provider}. Choose one of: {', '.join(PROVIDERS)}")
+    return PROVIDERS[config.provider](config, rate_limiter, token_counter, cache, metrics)
@@ -1,29 +1,160 @@
+import asyncio
+import threading
 import time
+from datetime import datetime, timezone
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second, now):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated_at = now
+    
+    def refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+            self.updated_at = now
+    
+    def time_until_available(self, amount, now):
+        self.refill(now)
+        # A single request larger than the bucket would never fit, so it only
+        # has to wait for a full bucket.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+    
+    def take(self, amount):
+        # The level may go negative: later callers then wait for the debt to refill
+        self.level -= amount
 
 class RateLimiter:
-    def __init__(self, config):
+    HEADER_BUCKETS = ("requests", "input-tokens", "output-tokens")
+    REPORT_INTERVAL = 60  # Seconds between messages about throttled requests
+    
+    def __init__(self, config, clock=time.monotonic, sleep=time.sleep):
         self.config = config
-        self.requests_made = 0
-        self.start_time = time.time()
-        self.last_request_time = self.start_time
-        
-    def wait_if_needed(self):
-        current_time = time.time()
-        
-        # Check minimum time between requests
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.config.request_delay:
-            time.sleep(self.config.request_delay - time_since_last_request)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
         
-        # Check rate limits
-        self.requests_made += 1
-        if self.requests_made >= self.config.requests_per_minute:
-            elapsed_time = current_time - self.start_time
-            if elapsed_time < 60:
-                wait_time = 60 - elapsed_time
-                print(f"Rate limit approached. Waiting {wait_time:.2f} seconds...")
-                time.sleep(wait_time)
-            self.start_time = time.time()
-            self.requests_made = 0
+        now = clock()
+        self.buckets = {
+            "requests": TokenBucket(config.request_burst, config.requests_per_minute / 60, now),
+            "input-tokens": TokenBucket(config.input_tokens_per_minute, config.input_tokens_per_minute / 60, now),
+            "output-tokens": TokenBucket(config.output_tokens_per_minute, config.output_tokens_per_minute / 60, now),
+        }
+        self.blocked_until = now
+        # Waits since the last message, which is printed at most once per
+        # REPORT_INTERVAL instead of for every request
+        self.waits = 0
+        self.waited = 0.0
+        self.next_report_at = now
+    
+    def reserve(self, input_tokens=0):
+        # Claim one request and the prompt's input tokens, and return how long
+        # the caller has to wait before sending it. Output tokens are unknown
+        # until the response arrives, so a request only waits for earlier
+        # output to be paid off; record_usage() charges the real amount.
+        with self.lock:
+            now = self.clock()
+            delay = max(
+                self.blocked_until - now,
+                self.buckets["requests"].time_until_available(1, now),
+                self.buckets["input-tokens"].time_until_available(input_tokens, now),
+                self.buckets["output-tokens"].time_until_available(0, now),
+                0.0
+            )
+            self.buckets["requests"].take(1)
+            self.buckets["input-tokens"].take(input_tokens)
+            return delay
+    
+    def wait_if_needed(self, input_tokens=0):
+        delay = self.reserve(input_tokens)
+        if delay > 0:
+            self._report_wait(delay)
+            self.sleep(delay)
+        return delay
+    
+    async def wait_if_needed_async(self, input_tokens=0):
+        delay = self.reserve(input_tokens)
+        if delay > 0:
+            self._report_wait(delay)
+            await asyncio.sleep(delay)
+        return delay
+    
+    def record_usage(self, estimated_input_tokens, input_tokens, output_tokens):
+        with self.lock:
+            now = self.clock()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            self.buckets["input-tokens"].take(input_tokens - estimated_input_tokens)
+            self.buckets["output-tokens"].take(output_tokens)
+    
+    def update_from_headers(self, headers):
+        # Align the local buckets with what the server reports. Returns the
+        # retry-after delay in seconds, or 0 if the server did not send one.
+        if not headers:
+            return 0.0
         
-        self.last_request_time = time.time()
\ No newline at end of file
+        with self.lock:
+            now = self.clock()
+            retry_after = self._parse_number(headers.get("retry-after"))
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            
+            for name in self.HEADER_BUCKETS:
+                bucket = self.buckets[name]
+                bucket.refill(now)
+                
+                limit = self._parse_number(headers.get(f"anthropic-ratelimit-{name}-limit"))
+                if limit:
+                    bucket.refill_per_second = limit / 60
+                    if name != "requests":
+                        # The request bucket keeps the configured burst size
+                        bucket.capacity = limit
+                
+                remaining = self._parse_number(headers.get(f"anthropic-ratelimit-{name}-remaining"))
+                if remaining is not None:
+                    bucket.level = min(bucket.level, remaining)
+                    if remaining <= 0:
+                        reset_in = self._seconds_until(headers.get(f"anthropic-ratelimit-{name}-reset"))
+                        if reset_in:
+                            self.blocked_until = max(self.blocked_until, now + reset_in)
+            
+            return retry_after or 0.0
+    
+    def _report_wait(self, delay):
+        with self.lock:
+            self.waits += 1
+            self.waited += delay
+            now = self.clock()
+            if now < self.next_report_at:
+                return
+            self.next_report_at = now + self.REPORT_INTERVAL
+            waits, waited = self.waits, self.waited
+            self.waits = 0
+            self.waited = 0.0
+        print(f"Rate limit approached. Requests waited {waited:.1f} seconds in total since the last message ({waits} throttled)")
+    
+    @staticmethod
+    def _parse_number(value):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _seconds_until(timestamp):
+        if not timestamp:
+            return None
+        try:
+            reset_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return max((reset_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
\ No newline at end of file
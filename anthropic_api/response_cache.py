@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class ResponseCache:
+    def __init__(self, path, max_age_days=30, max_size_mb=500, bypass=False, clock=time.time):
+        self.path = path
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.max_size = max_size_mb * 1024 * 1024
+        self.bypass = bypass
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        self.total_size = 0
+        
+        if not bypass:
+            self._open()
+    
+    @staticmethod
+    def make_key(model, max_tokens, prompt, response_format=None, system=None):
+        parts = [model, max_tokens, prompt, response_format]
+        if system is not None:
+            # Only appended when set, so keys of prompts without one stay valid
+            parts.append(system)
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        if self.bypass:
+            return None
+        
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            now = self.clock()
+            
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            
+            self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+    
+    def set(self, key, response):
+        if self.bypass:
+            return
+        
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            now = self.clock()
+            previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self.total_size += size - (previous[0] if previous else 0)
+            self._evict(now)
+            self.connection.commit()
+    
+    def evict(self):
+        if self.bypass:
+            return
+        with self.lock:
+            self._evict(self.clock())
+            self.connection.commit()
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_bytes": self.total_size,
+        }
+    
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # One connection shared by all threads, serialized through self.lock
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.evict()
+    
+    def _evict(self, now):
+        # Drop expired entries, then the least recently used ones until the
+        # cache fits in max_size again.
+        expired = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (now - self.max_age,)
+        ).fetchone()[0]
+        if expired:
+            self.connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+            self.total_size -= expired
+        
+        while self.total_size > self.max_size:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self.total_size = 0
+                break
+            for key, size in rows:
+                if self.total_size <= self.max_size:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_size -= size
\ No newline at end of file
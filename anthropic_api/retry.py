@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Timeouts, conflicts, rate limits and server errors are worth another attempt.
+# Any other status (400, 401, 403, 404, 413, 422) fails the same way again.
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RATE_LIMIT_STATUS_CODE = 429
+OVERLOADED_STATUS_CODE = 529
+# Errors without a status code that are still transient
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError"}
+
+_current_budget = contextvars.ContextVar("retry_budget", default=None)
+
+class DeadlineExceeded(Exception):
+    pass
+
+class CircuitOpenError(Exception):
+    pass
+
+def status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def is_retryable(error):
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1)):
+        try:
+            return max(float(headers.get(name)) * scale, 0.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+class RetryBudget:
+    # Shared by every call made for one document, including concurrent ones:
+    # no call starts after the deadline, and retries stop once max_retries
+    # retries have been spent on the document.
+    def __init__(self, deadline_seconds=None, max_retries=None, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = clock() + deadline_seconds if deadline_seconds else None
+        self.max_retries = max_retries
+        self.retries = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def current():
+        return _current_budget.get()
+    
+    @contextmanager
+    def scope(self):
+        token = _current_budget.set(self)
+        try:
+            yield self
+        finally:
+            _current_budget.reset(token)
+    
+    def remaining_seconds(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - self.clock(), 0.0)
+    
+    def check_deadline(self):
+        if self.remaining_seconds() == 0:
+            raise DeadlineExceeded("The document's deadline has passed")
+    
+    def allow_retry(self, delay):
+        # Claims a retry if one is left and it can start before the deadline
+        with self.lock:
+            if self.max_retries is not None and self.retries >= self.max_retries:
+                return False
+            remaining = self.remaining_seconds()
+            if remaining is not None and delay >= remaining:
+                return False
+            self.retries += 1
+            return True
+
+class CircuitBreaker:
+    # Opens after `threshold` overloaded responses in a row and holds every call
+    # for `cooldown` seconds, so concurrent requests stop hammering an overloaded
+    # provider. After the cooldown one probe call goes through: success closes
+    # the circuit, another overload opens it again.
+    def __init__(self, threshold=3, cooldown=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.open_until = None
+        self.probe_started = None
+        self.lock = threading.Lock()
+    
+    def wait_time(self):
+        # Seconds the caller has to wait before sending; 0 lets it through
+        with self.lock:
+            if self.open_until is None:
+                return 0.0
+            now = self.clock()
+            if now < self.open_until:
+                return self.open_until - now
+            if self.probe_started is None or now - self.probe_started > self.cooldown:
+                self.probe_started = now
+                return 0.0
+            return min(self.cooldown, 1.0)
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.open_until = None
+            self.probe_started = None
+    
+    def record_failure(self, overloaded):
+        with self.lock:
+            self.probe_started = None
+            if not overloaded:
+                # Only overloaded responses in a row count towards opening
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.threshold or self.open_until is not None:
+                self.open_until = self.clock() + self.cooldown
+                print(f"Provider overloaded. Pausing requests for {self.cooldown} seconds...")
+
+class RetryPolicy:
+    def __init__(self, config, clock=time.monotonic, sleep=asyncio.sleep, random=random.random):
+        self.max_retries = config.max_retries
+        self.initial_delay = config.initial_delay
+        self.max_delay = config.retry_max_delay
+        self.breaker = CircuitBreaker(config.circuit_breaker_threshold, config.circuit_breaker_cooldown, clock)
+        self.sleep = sleep
+        self.random = random
+    
+    async def call_async(self, attempt, max_retries=None, on_retry=None):
+        # Runs attempt() up to max_retries times. on_retry(error, retries, delay)
+        # is called before each retry.
+        max_retries = max_retries or self.max_retries
+        for retries in range(max_retries):
+            self._check_deadline()
+            delay = self._circuit_delay()
+            while delay:
+                await self.sleep(delay)
+                delay = self._circuit_delay()
+            try:
+                result = await attempt()
+            except Exception as e:
+                delay = self._retry_delay(e, retries, max_retries)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry(e, retries + 1, delay)
+                await self.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+    
+    def backoff(self, retries):
+        # Full jitter: anywhere between 0 and the exponential cap, so requests
+        # that failed together do not all retry at the same moment
+        return self.random() * min(self.max_delay, self.initial_delay * 2 ** retries)
+    
+    def _retry_delay(self, error, retries, max_retries):
+        # Seconds to wait before the next attempt, or None to give up
+        self.breaker.record_failure(status_code(error) == OVERLOADED_STATUS_CODE)
+        if not is_retryable(error) or retries >= max_retries - 1:
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            delay = self.backoff(retries)
+        budget = RetryBudget.current()
+        if budget is not None and not budget.allow_retry(delay):
+            print("The document's retry budget or deadline is used up. Not retrying.")
+            return None
+        return delay
+    
+    def _circuit_delay(self):
+        delay = self.breaker.wait_time()
+        budget = RetryBudget.current()
+        remaining = budget.remaining_seconds() if budget is not None else None
+        if delay and remaining is not None and delay >= remaining:
+            raise CircuitOpenError("The provider is overloaded and the document's deadline would pass while waiting")
+        return delay
+    
+    def _check_deadline(self):
+        budget = RetryBudget.current()
+        if budget is not None:
+            budget.check_deadline()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class DocumentScheduler:
+    def __init__(self, process_document, is_done, workers=2, usage=None):
+        self.process_document = process_document
+        self.is_done = is_done
+        self.workers = workers
+        self.usage = usage
+    
+    @staticmethod
+    def collect(pattern):
+        if os.path.isdir(pattern):
+            paths = glob.glob(os.path.join(pattern, "*.txt"))
+        else:
+            paths = glob.glob(pattern, recursive=True)
+        # Never pick up our own output files as new input
+        return [path for path in paths if os.path.isfile(path) and "_processed" not in os.path.basename(path)]
+    
+    @staticmethod
+    def order(paths, priority=None):
+        # Documents named in the priority list come first, in that order; the
+        # rest follow smallest first so short documents finish early.
+        priority = priority or []
+        ranks = {}
+        for rank, entry in enumerate(priority):
+            ranks.setdefault(os.path.abspath(entry), rank)
+            ranks.setdefault(os.path.basename(entry), rank)
+        
+        def sort_key(path):
+            rank = ranks.get(os.path.abspath(path), ranks.get(os.path.basename(path)))
+            if rank is not None:
+                return (0, rank, 0)
+            return (1, 0, os.path.getsize(path))
+        
+        return sorted(paths, key=sort_key)
+    
+    def run(self, paths, skip_done=True):
+        pending = []
+        skipped = []
+        for path in paths:
+            if skip_done and self.is_done(path):
+                skipped.append(path)
+            else:
+                pending.append(path)
+        
+        for path in skipped:
+            print(f"Skipping {path}: already processed")
+        print(f"Processing {len(pending)} documents with {self.workers} workers...")
+        
+        usage_before = self.usage() if self.usage else {}
+        start_time = time.time()
+        succeeded = []
+        failed = []
+        
+        # Documents are submitted in order, so the pool starts on them in that order
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.process_document, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error processing {path}: {str(e)}")
+                    result = None
+                (succeeded if result else failed).append(path)
+                print(f"Finished {len(succeeded) + len(failed)} of {len(pending)}: {path}")
+        
+        elapsed = time.time() - start_time
+        usage_after = self.usage() if self.usage else {}
+        tokens = sum(usage_after.get(name, 0) - usage_before.get(name, 0) for name in usage_after)
+        
+        summary = {
+            "processed": len(succeeded),
+            "failed": len(failed),
+            "skipped": len(skipped),
+            "elapsed_seconds": elapsed,
+            "documents_per_minute": len(succeeded) / elapsed * 60 if elapsed else 0.0,
+            "tokens": tokens,
+            "tokens_per_minute": tokens / elapsed * 60 if elapsed else 0.0,
+            "failed_paths": failed,
+        }
+        self.print_summary(summary)
+        return summary
+    
+    @staticmethod
+    def print_summary(summary):
+        print("\nBatch summary")
+        print(f"  Processed: {summary['processed']}, failed: {summary['failed']}, skipped: {summary['skipped']}")
+        print(f"  Elapsed: {summary['elapsed_seconds']:.1f} s")
+        print(f"  Throughput: {summary['documents_per_minute']:.2f} docs/min, {summary['tokens_per_minute']:.0f} tokens/min")
+        for path in summary['failed_paths']:
+            print(f"  Failed: {path}")
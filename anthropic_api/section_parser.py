@@ -0,0 +1,78 @@
+import re
+
+# "SECTION: Title", also when wrapped in markdown, e.g. "**SECTION:** Title"
+SECTION_LINE = re.compile(r"[\s#*_]*SECTION[*_]*\s*:[*_]*(.*)")
+
+class SectionParser:
+    # Parses the SECTION: text protocol - a title line, then "SECTION: <title>"
+    # lines each followed by the section's content - from fragments of any
+    # size, e.g. the pieces of a streamed response. Section content is kept as
+    # a list of lines and joined once, when the section ends. A response cut
+    # off mid-section keeps everything up to the cut, and a response without
+    # any SECTION: lines becomes one section instead of none.
+    def __init__(self):
+        self.document_title = None
+        self.sections = []
+        self._section = None
+        self._lines = None
+        self._pending = []
+        self._preamble = []
+    
+    @classmethod
+    def parse(cls, text):
+        parser = cls()
+        parser.feed(text)
+        return parser.close()
+    
+    def feed(self, text):
+        lines = text.split("\n")
+        if len(lines) == 1:
+            self._pending.append(text)
+            return
+        self._pending.append(lines[0])
+        self._add_line("".join(self._pending))
+        for line in lines[1:-1]:
+            self._add_line(line)
+        self._pending = [lines[-1]]
+    
+    def close(self):
+        # Returns the document title and the sections, including a last
+        # section that was still open
+        self._add_line("".join(self._pending))
+        self._pending = []
+        if not self.sections and self._section is None and "".join(self._preamble).strip():
+            self._section = {'title': self.document_title, 'content': ''}
+            self._lines = self._preamble
+        self._finish_section(last=True)
+        return self.document_title or "", self.sections
+    
+    def _add_line(self, line):
+        match = SECTION_LINE.match(line) if "SECTION" in line else None
+        if match:
+            # A response that starts with a section has no title
+            if self.document_title is None:
+                self.document_title = ""
+            self._finish_section()
+            self._section = {'title': match.group(1).strip().strip("*_").strip(), 'content': ''}
+            self._lines = []
+        elif self.document_title is None:
+            # The first line with any text is the title
+            if line.strip():
+                self.document_title = line.strip().strip("#*_").strip()
+        elif self._section is not None:
+            self._lines.append(line)
+        elif not self.sections:
+            self._preamble.append(line)
+    
+    def _finish_section(self, last=False):
+        if self._section is None:
+            return
+        content = "\n".join(self._lines)
+        if last:
+            # Trailing whitespace at the end of the response is not content
+            content = content.rstrip()
+        # Every content line ends with a newline
+        self._section['content'] = content + "\n" if content or (self._lines and not last) else ""
+        self.sections.append(self._section)
+        self._section = None
+        self._lines = None
\ No newline at end of file
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from config import Config
+from job_queue import JobQueue, DONE
+from main import create_processor, print_cache_stats
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # The HTTP API:
+    #   POST   /jobs              {"path": "..."} or {"text": "...", "name": "..."}
+    #   GET    /jobs              every job and its status
+    #   GET    /jobs/<id>         one job
+    #   GET    /jobs/<id>/result  the processed document, once the job is done
+    #   DELETE /jobs/<id>         cancel a job that has not started
+    #   GET    /health            queue counts, token usage and cache stats
+    #   GET    /metrics           run metrics in the Prometheus text format
+    # The server sets service, the running Service.
+    service = None
+    
+    def do_GET(self):
+        parts = self._path_parts()
+        if parts == ["health"]:
+            return self._send_json(200, self.service.health())
+        if parts == ["metrics"]:
+            return self._send_metrics()
+        if parts == ["jobs"]:
+            return self._send_json(200, {"jobs": [job.to_dict() for job in self.service.jobs.list()]})
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.jobs.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": f"No job {parts[1]}"})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2] == "result":
+                return self._send_result(job)
+        self._send_json(404, {"error": "Not found"})
+    
+    def do_POST(self):
+        if self._path_parts() != ["jobs"]:
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if "text" in body:
+                job = self.service.jobs.submit_text(body["text"], body.get("name"))
+            elif "path" in body:
+                job = self.service.jobs.submit_path(body["path"])
+            else:
+                raise ValueError('The request needs a "path" or a "text"')
+        except (ValueError, TypeError, AttributeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.to_dict())
+    
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": "Not found"})
+        if self.service.jobs.get(parts[1]) is None:
+            return self._send_json(404, {"error": f"No job {parts[1]}"})
+        if not self.service.jobs.cancel(parts[1]):
+            return self._send_json(409, {"error": "Only a queued job can be cancelled"})
+        self._send_json(200, self.service.jobs.get(parts[1]).to_dict())
+    
+    def _send_result(self, job):
+        if job.status != DONE:
+            return self._send_json(409, {"error": f"Job {job.id} is {job.status}", "status": job.status})
+        with open(job.output_path, 'rb') as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_metrics(self):
+        metrics = self.service.processor.metrics
+        if metrics is None:
+            return self._send_json(404, {"error": "Metrics are disabled"})
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _path_parts(self):
+        return [part for part in urlparse(self.path).path.split("/") if part]
+    
+    def address_string(self):
+        # Clients of a Unix socket have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+    
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class Service:
+    # Keeps one processor - and with it the client and its connection pools,
+    # the tokenizer, the rate limiter and the response cache - for as long as
+    # it runs, and processes submitted documents on a JobQueue.
+    def __init__(self, config):
+        self.config = config
+        # Each worker thread keeps its event loop, so async clients are reused
+        config.persistent_event_loops = True
+        self.processor, self.client, self.response_cache = create_processor(config)
+        # Load the tokenizer now instead of during the first job
+        self.processor.token_counter.count_tokens("warm-up")
+        self.jobs = JobQueue(
+            self.processor.process_document,
+            config.service_jobs_dir,
+            config.service_workers,
+            config.service_job_history
+        )
+        self.server = None
+    
+    def health(self):
+        health = {
+            "status": "ok",
+            "provider": self.config.provider,
+            "workers": self.jobs.workers,
+            "jobs": self.jobs.counts(),
+            "usage": self.client.usage_totals(),
+        }
+        if not self.config.cache_bypass:
+            health["response_cache"] = self.response_cache.stats()
+        return health
+    
+    def listen(self, host=None, port=None, socket_path=None):
+        handler = type("Handler", (ServiceHandler,), {"service": self})
+        if socket_path:
+            # A socket file left behind by a previous run would make bind fail
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = UnixHTTPServer(socket_path, handler)
+        else:
+            self.server = ThreadingHTTPServer((host, port), handler)
+            self.server.daemon_threads = True
+        return self.server
+    
+    def serve_forever(self):
+        self.jobs.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+    
+    def close(self):
+        self.server.server_close()
+        if isinstance(self.server, UnixHTTPServer) and os.path.exists(self.server.server_address):
+            os.remove(self.server.server_address)
+        print("Waiting for running jobs to finish...")
+        self.jobs.stop()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the document processor as a service with a job queue and an HTTP API.")
+    parser.add_argument("--host", default=None, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on")
+    parser.add_argument("--socket", default=None, help="Unix socket path to listen on instead of host and port")
+    parser.add_argument("--workers", type=int, default=None, help="Jobs processed at the same time")
+    parser.add_argument("--provider", choices=["anthropic", "openai", "fake"], help="Model provider to use")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = Config()
+    if args.provider:
+        config.provider = args.provider
+    if args.workers:
+        config.service_workers = args.workers
+    
+    service = Service(config)
+    socket_path = args.socket or config.service_socket
+    port = args.port if args.port is not None else config.service_port
+    server = service.listen(args.host or config.service_host, port, socket_path)
+    if socket_path:
+        print(f"Document service ({config.provider}) listening on {socket_path}")
+    else:
+        host, port = server.server_address[:2]
+        print(f"Document service ({config.provider}) listening on http://{host}:{port}")
+    print(f"{config.service_workers} workers. Press Ctrl+C to stop.")
+    
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print_cache_stats(config, service.response_cache, service.client)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
@@ -1,24 +1,192 @@
+import re
+from bisect import bisect_left, bisect_right
+
+# How strong the break between two tokens is. Chunks end on the strongest
+# break close to the target size and never cut inside a word unless one word
+# alone exceeds the target.
+WORD, SENTENCE, LINE, PARAGRAPH, SPEAKER_TURN = range(5)
+
+# A line that opens a speaker turn: an optional timestamp and a short name or
+# label followed by a colon, e.g. "Talare 1: ..." or "[00:12:03] Anna: ..."
+SPEAKER_TURN_PATTERN = re.compile(
+    r"^[ \t]*(?:\[?\d{1,2}:\d{2}(?::\d{2})?\]?[ \t]*)?[^\W\d_][\w .'-]{0,40}?:(?=[ \t]|$)",
+    re.MULTILINE
+)
+SENTENCE_ENDS = ".!?…"
+CLOSING_QUOTES = "\"'”’)"
+# Whitespace after a full stop, question or exclamation mark, possibly
+# followed by closing quotes or parentheses, and whitespace around line breaks
+SENTENCE_BREAK = re.compile(f"[{re.escape(SENTENCE_ENDS)}][{re.escape(CLOSING_QUOTES)}]*(\\s+)")
+LINE_BREAK = re.compile(r"\s*\n\s*")
+
 class TextChunker:
+    # Tokens past a chunk's end that iter_chunks waits for before cutting it
+    LOOKAHEAD_TOKENS = 64
+    # Tokens that re-encoding a chunk on its own may add at its edges
+    EDGE_TOKENS = 8
+    
     def __init__(self, token_counter, config):
         self.token_counter = token_counter
         self.config = config
     
     def chunk_text(self, text):
-        words = text.split()
+        # Chunks are slices of the original text, so line breaks, paragraphs and
+        # speaker turns reach the model unchanged.
+        chunks, _ = self._chunk(text)
+        return chunks
+    
+    def iter_chunks(self, blocks):
+        # Chunks text that arrives in blocks, e.g. from InputReader, yielding
+        # each chunk as soon as the text after it is known and keeping only the
+        # text from the next chunk's start. A chunk only depends on the text
+        # from its own start, so the chunks are the same for any block size.
+        buffer = ""
+        # Characters for about one chunk, doubled whenever that is too few
+        lookahead = self.config.target_token_count * 4
+        for block in blocks:
+            buffer += block
+            while len(buffer) >= lookahead:
+                # A few chunks' worth is tokenized at a time, however large the block
+                chunks, rest = self._chunk(buffer[:lookahead * 4], final=False)
+                yield from chunks
+                if not chunks:
+                    lookahead *= 2
+                buffer = buffer[rest:]
+        chunks, _ = self._chunk(buffer)
+        yield from chunks
+    
+    def _chunk(self, text, final=True):
+        # Returns the chunks and where the text not chunked yet starts. Unless
+        # final, chunks that the end of the text could still change are left
+        # for later, as are speaker-turn labels that may continue past it.
+        offsets = self.token_counter.token_offsets(text)
+        positions, levels = self._boundaries(text, offsets)
+        target = self.config.target_token_count
+        window = max(1, int(target * self.config.chunk_boundary_window))
+        overlap = min(self.config.chunk_overlap_tokens, target // 2)
+        margin = 0 if final else self.LOOKAHEAD_TOKENS
+        chunks = []
+        start = 0
+        
+        while start < len(offsets):
+            end = start + target
+            if end + margin >= len(offsets) and not final:
+                return chunks, offsets[start][0]
+            if end < len(offsets):
+                end = self._best_break(positions, levels, start, end, window)
+            else:
+                end = len(offsets)
+            
+            chunk = self._slice(text, offsets, start, end)
+            # Re-encoding a slice on its own can differ by a token or two at the
+            # edges, so a chunk that close to the target is counted again and
+            # backed off one word at a time if it ends up too large.
+            while end - start > max(1, target - self.EDGE_TOKENS) and self.token_counter.count_tokens(chunk) > target:
+                index = bisect_right(positions, end - 1) - 1
+                end = positions[index] if index >= 0 and positions[index] > start else end - 1
+                chunk = self._slice(text, offsets, start, end)
+            
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(offsets):
+                break
+            start = self._overlap_start(positions, levels, start, end, overlap)
+        
+        return chunks, len(text)
+    
+    def rechunk(self, text, previous_chunks):
+        # Keep every chunk of the previous run that still appears, in order, in
+        # the new text and only chunk the edited stretches between them again.
         chunks = []
-        current_chunk = []
-        current_token_count = 0
+        position = 0
+        search_from = 0
+        
+        for previous_chunk in previous_chunks:
+            index = self._find_chunk(text, previous_chunk, search_from)
+            if index < 0:
+                continue
+            gap = text[position:index].strip()
+            if gap:
+                chunks.extend(self.chunk_text(gap))
+            chunks.append(previous_chunk)
+            position = max(position, index + len(previous_chunk))
+            # With overlap, the next chunk may start inside this one
+            search_from = index + 1 if self.config.chunk_overlap_tokens else position
+        
+        rest = text[position:].strip()
+        if rest:
+            chunks.extend(self.chunk_text(rest))
+        return chunks
+    
+    def _best_break(self, positions, levels, start, end, window):
+        # The strongest break among the last `window` tokens before `end`,
+        # preferring the latest one; otherwise the last word break at all.
+        low = bisect_right(positions, max(start, end - window))
+        high = bisect_right(positions, end)
+        best = None
+        for index in range(low, high):
+            if best is None or levels[index] >= levels[best]:
+                best = index
+        if best is not None:
+            return positions[best]
+        if high > 0 and positions[high - 1] > start:
+            return positions[high - 1]
+        return end
+    
+    def _overlap_start(self, positions, levels, start, end, overlap):
+        # Start the next chunk up to `overlap` tokens before the end of this
+        # one, at the earliest of the strongest breaks in that stretch.
+        if overlap <= 0:
+            return end
+        low = bisect_left(positions, max(start + 1, end - overlap))
+        high = bisect_left(positions, end)
+        best = None
+        for index in range(low, high):
+            if best is None or levels[index] > levels[best]:
+                best = index
+        return positions[best] if best is not None else end
+    
+    @staticmethod
+    def _find_chunk(text, chunk, start):
+        # str.find, but only accept matches that begin and end at whitespace
+        index = text.find(chunk, start)
+        while index >= 0:
+            end = index + len(chunk)
+            if (index == 0 or text[index - 1].isspace()) and (end == len(text) or text[end].isspace()):
+                return index
+            index = text.find(chunk, index + 1)
+        return -1
+    
+    def _slice(self, text, offsets, start, end):
+        return text[offsets[start][0]:offsets[end - 1][1]].strip()
+    
+    def _boundaries(self, text, offsets):
+        # Token indices that begin a new word, with the strength of the break
+        # before them. Most breaks are spaces between words, so only the
+        # whitespace after a sentence or around a line break is looked at
+        # one run at a time.
+        positions = [
+            i for i, (start, _) in enumerate(offsets)
+            if i and (text[start].isspace() or start and text[start - 1].isspace())
+        ]
+        starts = [offsets[i][0] for i in positions]
+        levels = [WORD] * len(positions)
+        
+        def mark(left, right, level):
+            # Every token that starts inside the run or right after it
+            for index in range(bisect_left(starts, left), bisect_right(starts, right)):
+                levels[index] = level
         
-        for word in words:
-            word_tokens = self.token_counter.count_tokens(word)
-            if current_token_count + word_tokens > self.config.target_token_count:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_token_count = word_tokens
+        for match in SENTENCE_BREAK.finditer(text):
+            mark(*match.span(1), SENTENCE)
+        turn_starts = {match.start() for match in SPEAKER_TURN_PATTERN.finditer(text)}
+        for match in LINE_BREAK.finditer(text):
+            left, right = match.span()
+            if text.rfind("\n", left, right) + 1 in turn_starts:
+                level = SPEAKER_TURN
+            elif match.group().count("\n") >= 2:
+                level = PARAGRAPH
             else:
-                current_chunk.append(word)
-                current_token_count += word_tokens
-                
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-        return chunks
\ No newline at end of file
+                level = LINE
+            mark(left, right, level)
+        return positions, levels
@@ -1,8 +1,162 @@
-from transformers import GPT2Tokenizer
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocab", "gpt2-tokenizer.json")
+
+# Tokenizer backends by name. Each entry is a factory taking the vocabulary path
+# and returning an object with token_offsets(text) and count_tokens(text).
+BACKENDS = {}
+
+def register_backend(name):
+    def decorator(factory):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+class TransformersBackend:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+    
+    def token_offsets(self, text):
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False
+        )
+        return encoding["offset_mapping"]
+    
+    def count_tokens(self, text):
+        return len(self.tokenizer.encode(text, verbose=False))
+
+class TokenizersBackend:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+    
+    def token_offsets(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False).offsets
+    
+    def count_tokens(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+class ApproximateBackend:
+    # GPT-2 style pre-tokenization with long pieces cut every four characters.
+    # Needs no vocabulary, but counts are only an estimate.
+    PATTERN = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+")
+    PIECE_LENGTH = 4
+    
+    def token_offsets(self, text):
+        offsets = []
+        for match in self.PATTERN.finditer(text):
+            start, end = match.span()
+            if end - start <= self.PIECE_LENGTH:
+                offsets.append((start, end))
+                continue
+            # A leading space belongs to the first piece, as in GPT-2
+            first_end = min(end, start + self.PIECE_LENGTH + (text[start] == " "))
+            offsets.append((start, first_end))
+            for piece_start in range(first_end, end, self.PIECE_LENGTH):
+                offsets.append((piece_start, min(end, piece_start + self.PIECE_LENGTH)))
+        return offsets
+    
+    def count_tokens(self, text):
+        return len(self.token_offsets(text))
+
+@register_backend("bundled")
+def _load_bundled(vocabulary_path):
+    # The tokenizers package is the Rust core of transformers' fast tokenizers
+    # and imports in a fraction of the time.
+    from tokenizers import Tokenizer
+    return TokenizersBackend(Tokenizer.from_file(vocabulary_path or DEFAULT_VOCABULARY_PATH))
+
+@register_backend("transformers")
+def _load_transformers(vocabulary_path):
+    # Downloads the tokenizer from the Hugging Face hub if it is not cached
+    try:
+        return _load_cached_transformers()
+    except OSError:
+        from transformers import GPT2TokenizerFast
+        return TransformersBackend(GPT2TokenizerFast.from_pretrained("gpt2"))
+
+def _load_cached_transformers():
+    from transformers import GPT2TokenizerFast
+    return TransformersBackend(GPT2TokenizerFast.from_pretrained("gpt2", local_files_only=True))
+
+@register_backend("approximate")
+def _load_approximate(vocabulary_path):
+    return ApproximateBackend()
+
+@register_backend("auto")
+def _load_auto(vocabulary_path):
+    # Prefer the bundled vocabulary, then a tokenizer already in the local
+    # Hugging Face cache, and fall back to the approximate backend. Nothing is
+    # downloaded; that takes choosing the transformers backend.
+    if os.path.exists(vocabulary_path or DEFAULT_VOCABULARY_PATH):
+        try:
+            return _load_bundled(vocabulary_path)
+        except ImportError:
+            pass
+    try:
+        return _load_cached_transformers()
+    except (ImportError, OSError) as e:
+        print(f"GPT-2 tokenizer unavailable ({str(e)}), using approximate token counts")
+        return _load_approximate(vocabulary_path)
 
 class TokenCounter:
-    def __init__(self):
-        self.tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
+    def __init__(self, backend="auto", vocabulary_path=None, cache_size=4096):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown tokenizer backend: {backend}")
+        self.backend_name = backend
+        self.vocabulary_path = vocabulary_path
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._backend = None
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def backend(self):
+        # Loaded on first use, so that starting up never waits for the tokenizer
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = BACKENDS[self.backend_name](self.vocabulary_path)
+        return self._backend
     
     def count_tokens(self, text):
-        return len(self.tokenizer.encode(text))
\ No newline at end of file
+        # Prompts and section texts are counted over and over, so counts are
+        # memoized. Long texts are keyed by a digest to keep the cache small.
+        key = text if len(text) <= 256 else hashlib.blake2b(text.encode("utf-8")).digest()
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                self.cache_hits += 1
+                return self._counts[key]
+        
+        count = self.backend.count_tokens(text)
+        with self._lock:
+            self.cache_misses += 1
+            self._counts[key] = count
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+    
+    def token_offsets(self, text):
+        # One pass over the whole text, returning the (start, end) character span
+        # of every token.
+        return self.backend.token_offsets(text)
+
+_shared_counters = {}
+_shared_lock = threading.Lock()
+
+def get_token_counter(backend="auto", vocabulary_path=None):
+    # One TokenCounter per backend for the whole process
+    with _shared_lock:
+        key = (backend, vocabulary_path)
+        if key not in _shared_counters:
+            _shared_counters[key] = TokenCounter(backend, vocabulary_path)
+        return _shared_counters[key]
@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anthropic_api"))
+
+from config import Config
+from tokenizer import get_token_counter
+from text_processor import TextChunker
+
+WORDS = (
+    "och att det som är en på för med inte den till av om så men var jag "
+    "vi kan ska har funktion variabel klass objekt metod arv gränssnitt "
+    "algoritm komplexitet rekursion lista träd graf databas transaktion "
+    "index nyckel fråga svar exempel föreläsning kapitel uppgift"
+).split()
+
+
+def generate_transcript(word_count, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    remaining = word_count
+    while remaining > 0:
+        length = min(rng.randint(6, 24), remaining)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def chunk_text_per_word(token_counter, config, text):
+    # The previous implementation: one tokenizer call per whitespace word
+    words = text.split()
+    chunks = []
+    current_chunk = []
+    current_token_count = 0
+
+    for word in words:
+        word_tokens = token_counter.count_tokens(word)
+        if current_token_count + word_tokens > config.target_token_count:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = [word]
+            current_token_count = word_tokens
+        else:
+            current_chunk.append(word)
+            current_token_count += word_tokens
+
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+
+def time_call(repeat, function, *args):
+    # The fastest of `repeat` runs, which is the least disturbed by the machine
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-pass and per-word chunking.")
+    parser.add_argument("--words", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--target", type=int, default=None, help="Override Config.target_token_count")
+    parser.add_argument("--repeat", type=int, default=3, help="Time the best of this many runs")
+    args = parser.parse_args()
+
+    config = Config()
+    if args.target:
+        config.target_token_count = args.target
+    token_counter = get_token_counter(config.tokenizer_backend, config.tokenizer_path)
+    chunker = TextChunker(token_counter, config)
+
+    print(f"Target token count: {config.target_token_count}")
+    print(f"{'words':>10} {'per-word (s)':>14} {'single-pass (s)':>16} {'speedup':>9} {'chunks':>8} {'max tokens':>11}")
+
+    for word_count in args.words:
+        text = generate_transcript(word_count)
+        # The legacy path runs on the backend itself: the shared counter memoizes
+        # counts, which would hide the per-word encode calls being measured
+        legacy_time, _ = time_call(args.repeat, chunk_text_per_word, token_counter.backend, config, text)
+        fast_time, chunks = time_call(args.repeat, chunker.chunk_text, text)
+        max_tokens = max(token_counter.count_tokens(chunk) for chunk in chunks)
+        speedup = legacy_time / fast_time if fast_time else float("inf")
+        print(f"{word_count:>10} {legacy_time:>14.2f} {fast_time:>16.2f} {speedup:>8.1f}x {len(chunks):>8} {max_tokens:>11}")
+
+        if max_tokens > config.target_token_count:
+            print(f"  WARNING: a chunk exceeds the target by {max_tokens - config.target_token_count} tokens")
+
+
+if __name__ == "__main__":
+    main()
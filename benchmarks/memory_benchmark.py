@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anthropic_api")
+sys.path.insert(0, PACKAGE_DIR)
+
+WORDS = (
+    "och att det som är en på för med inte den till av om så men var jag "
+    "vi kan ska har funktion variabel klass objekt metod arv gränssnitt "
+    "algoritm komplexitet rekursion lista träd graf databas transaktion "
+    "index nyckel fråga svar exempel föreläsning kapitel uppgift"
+).split()
+
+MODES = ("whole", "streaming", "pipeline")
+
+
+def write_transcript(path, size_mb, seed=0):
+    # Speaker turns of a few sentences each, written a turn at a time so the
+    # benchmark itself never holds the transcript
+    generator = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as file:
+        while written < target:
+            sentences = []
+            for _ in range(generator.randint(2, 6)):
+                sentence = " ".join(generator.choice(WORDS) for _ in range(generator.randint(6, 18)))
+                sentences.append(sentence.capitalize() + ".")
+            turn = f"Talare {generator.randint(1, 3)}: " + " ".join(sentences) + "\n\n"
+            file.write(turn)
+            written += len(turn.encode("utf-8"))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode, path, args):
+    # Runs in its own process, so each mode's peak RSS is its own
+    from config import Config
+    from tokenizer import get_token_counter
+    from text_processor import TextChunker
+    from input_reader import InputReader
+
+    config = Config()
+    config.tokenizer_backend = args.tokenizer or config.tokenizer_backend
+    if args.target:
+        config.target_token_count = args.target
+    config.input_block_size = int(args.block_size_mb * 1024 * 1024)
+    token_counter = get_token_counter(config.tokenizer_backend, config.tokenizer_path)
+    chunker = TextChunker(token_counter, config)
+    reader = InputReader(config.input_block_size, config.input_fallback_encoding, config.stream_input_mb)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "whole":
+        # The previous input path: the whole file in memory, then chunked at once
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read()
+        chunks = len(chunker.chunk_text(text))
+    elif mode == "streaming":
+        chunks = sum(1 for _ in chunker.iter_chunks(reader.read_blocks(path)))
+    else:
+        chunks = run_pipeline(config, token_counter, chunker, reader, path)
+    elapsed = time.perf_counter() - start
+
+    return {"mode": mode, "seconds": elapsed, "chunks": chunks, "baseline_mb": baseline, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_pipeline(config, token_counter, chunker, reader, path):
+    # The whole realtime pipeline with the offline fake provider, reading the
+    # input while it is processed
+    import contextlib
+    import io
+    from rate_limiter import RateLimiter
+    from fake_client import FakeClient
+    from document_processor import DocumentProcessor
+
+    config.provider = "fake"
+    config.fake_latency = 0.0
+    config.cache_bypass = True
+    config.resume_runs = False
+    config.metrics_enabled = False
+    config.stream_input_mb = 0
+    config.requests_per_minute = 10 ** 9
+    config.request_burst = 10 ** 6
+    config.input_tokens_per_minute = 10 ** 12
+    config.output_tokens_per_minute = 10 ** 12
+    reader.stream_threshold = 0
+    client = FakeClient(config, RateLimiter(config), token_counter)
+    processor = DocumentProcessor(config, token_counter, chunker, client, input_reader=reader)
+    with contextlib.redirect_stdout(io.StringIO()):
+        output_path = processor.process_document(path)
+    if output_path is None:
+        raise RuntimeError("The pipeline failed")
+    os.remove(output_path)
+    return client.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of reading and chunking a large transcript.")
+    parser.add_argument("--size-mb", type=int, default=300, help="Size of the generated transcript")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["whole", "streaming"],
+                        help="whole: read and chunk at once; streaming: InputReader and iter_chunks; "
+                             "pipeline: process_document with the fake provider (slow on large inputs)")
+    parser.add_argument("--target", type=int, default=None, help="Override Config.target_token_count")
+    parser.add_argument("--block-size-mb", type=float, default=1.0, help="Input block size for streaming")
+    parser.add_argument("--tokenizer", default=None, help="Override Config.tokenizer_backend")
+    parser.add_argument("--input", help="Use this transcript instead of generating one")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.input, args)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.input
+        if path is None:
+            path = os.path.join(workdir, "transcript.txt")
+            print(f"Writing a {args.size_mb} MB transcript...")
+            write_transcript(path, args.size_mb)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        print(f"Input: {size_mb:.0f} MB")
+        print(f"{'mode':>10} {'seconds':>9} {'chunks/calls':>13} {'baseline MB':>12} {'peak RSS MB':>12} {'peak / input':>13}")
+        for mode in args.modes:
+            command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--input", path,
+                       "--block-size-mb", str(args.block_size_mb)]
+            if args.target:
+                command += ["--target", str(args.target)]
+            if args.tokenizer:
+                command += ["--tokenizer", args.tokenizer]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                # e.g. killed for running out of memory
+                print(f"{mode:>10} failed with exit code {completed.returncode}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{mode:>10} {result['seconds']:>9.1f} {result['chunks']:>13} {result['baseline_mb']:>12.0f} "
+                  f"{result['peak_rss_mb']:>12.0f} {result['peak_rss_mb'] / size_mb:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
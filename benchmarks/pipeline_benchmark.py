@@ -0,0 +1,379 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anthropic_api"))
+
+WORDS = (
+    "och att det som en på är av för med till den har inte om ett men så vi kan "
+    "projektet kunden modellen resultatet frågan mötet planen budgeten risken "
+    "lösningen tidplanen leveransen testerna användarna data analysen beslutet"
+).split()
+
+
+class SimulatedLLMServer:
+    # A local stand-in for the Anthropic Messages and OpenAI Chat Completions
+    # endpoints. It answers the pipeline's prompts in their text protocol, with
+    # a fixed latency, streamed or not, and rejects a share of requests with 429.
+    def __init__(self, latency=0.05, rate_limit_share=0.0, retry_after=1, section_words=400, expansion_factor=1.5, seed=0):
+        self.latency = latency
+        self.rate_limit_share = rate_limit_share
+        self.retry_after = retry_after
+        self.section_words = section_words
+        self.expansion_factor = expansion_factor
+        self.random = random.Random(seed)
+        self.counts = {"split": 0, "expand": 0, "combine": 0, "rate_limited": 0}
+        self.cached_systems = set()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def reset_counts(self):
+        with self.lock:
+            for name in self.counts:
+                self.counts[name] = 0
+    
+    def should_rate_limit(self):
+        with self.lock:
+            limited = self.random.random() < self.rate_limit_share
+            if limited:
+                self.counts["rate_limited"] += 1
+            return limited
+    
+    def prompt_cache_usage(self, system):
+        # Mimics prompt caching: the first request with a cacheable system
+        # prompt writes it, later ones read it. Returns (read, written) tokens.
+        text = "".join(block.get("text", "") for block in system if block.get("cache_control"))
+        if not text:
+            return 0, 0
+        with self.lock:
+            cached = text in self.cached_systems
+            self.cached_systems.add(text)
+        return (len(text) // 4, 0) if cached else (0, len(text) // 4)
+    
+    def respond(self, prompt):
+        if "Här är texten att bearbeta:" in prompt:
+            kind, text = "split", self._split_response(prompt)
+        elif "Originaltext:" in prompt:
+            original = self._after(prompt, "Originaltext:").split()
+            words = [original[i % len(original)] for i in range(int(len(original) * self.expansion_factor))] if original else []
+            kind, text = "expand", "EXPANDED_CONTENT:\n" + " ".join(words)
+        else:
+            sections = self._after(prompt, "Dokumenttitel:").split("\n", 1)[-1]
+            kind, text = "combine", "PARTIAL_DOCUMENT:\n" + sections.strip()
+        with self.lock:
+            self.counts[kind] += 1
+        return text
+    
+    def _split_response(self, prompt):
+        words = prompt.split("Här är texten att bearbeta:", 1)[1].split()
+        lines = ["Simulerat dokument"]
+        for start in range(0, len(words), self.section_words):
+            lines.append(f"SECTION: Del {start // self.section_words + 1}")
+            lines.append(" ".join(words[start:start + self.section_words]))
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _after(text, start):
+        # The text to work on runs to the end of the user message
+        return text.split(start, 1)[-1].strip()
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                openai = self.path.endswith("/chat/completions")
+                if server.should_rate_limit():
+                    self._send_rate_limit(openai)
+                    return
+                
+                time.sleep(server.latency)
+                prompt = self._prompt(body)
+                text = server.respond(prompt)
+                system = body.get("system")
+                cache_read, cache_creation = server.prompt_cache_usage(system if isinstance(system, list) else [])
+                input_tokens = len(prompt) // 4 - cache_read - cache_creation
+                output_tokens = len(text) // 4
+                cache_usage = {"cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_creation}
+                model = body.get("model", "simulated")
+                if openai and body.get("stream"):
+                    self._send_events(self._openai_events(model, text, input_tokens, output_tokens))
+                elif openai:
+                    self._send_json(200, {
+                        "id": "chatcmpl-simulated",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+                    })
+                elif body.get("stream"):
+                    self._send_events(self._anthropic_events(model, text, input_tokens, output_tokens, cache_usage))
+                else:
+                    self._send_json(200, {
+                        "id": "msg_simulated",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": model,
+                        "content": [{"type": "text", "text": text}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens, **cache_usage},
+                    })
+            
+            @staticmethod
+            def _prompt(body):
+                # The system prompt and every message, so the markers are found
+                # wherever the client puts them
+                parts = []
+                system = body.get("system")
+                if isinstance(system, str):
+                    parts.append(system)
+                elif isinstance(system, list):
+                    parts.extend(block.get("text", "") for block in system)
+                for message in body.get("messages", []):
+                    content = message.get("content", "")
+                    if isinstance(content, str):
+                        parts.append(content)
+                    else:
+                        parts.extend(block.get("text", "") for block in content)
+                return "\n".join(parts)
+            
+            def _send_rate_limit(self, openai):
+                if openai:
+                    error = {"error": {"message": "Simulated rate limit", "type": "rate_limit_error", "code": None}}
+                else:
+                    error = {"type": "error", "error": {"type": "rate_limit_error", "message": "Simulated rate limit"}}
+                self._send_json(429, error, {"retry-after": str(server.retry_after)})
+            
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _send_events(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in events:
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            
+            @staticmethod
+            def _pieces(text, size=200):
+                return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            
+            def _anthropic_events(self, model, text, input_tokens, output_tokens, cache_usage):
+                def event(name, data):
+                    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+                
+                yield event("message_start", {"type": "message_start", "message": {
+                    "id": "msg_simulated", "type": "message", "role": "assistant", "model": model, "content": [],
+                    "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": input_tokens, "output_tokens": 1, **cache_usage},
+                }})
+                yield event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+                for piece in self._pieces(text):
+                    yield event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+                yield event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                yield event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": output_tokens}})
+                yield event("message_stop", {"type": "message_stop"})
+            
+            def _openai_events(self, model, text, input_tokens, output_tokens):
+                def chunk(choices, usage=None):
+                    data = {"id": "chatcmpl-simulated", "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": model, "choices": choices, "usage": usage}
+                    return f"data: {json.dumps(data)}\n\n"
+                
+                for piece in self._pieces(text):
+                    yield chunk([{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}])
+                yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                yield chunk([], {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens})
+                yield "data: [DONE]\n\n"
+        
+        return Handler
+
+
+def write_transcript(path, words, seed):
+    # Speaker turns of a few sentences each, separated by blank lines
+    generator = random.Random(seed)
+    turns = []
+    written = 0
+    while written < words:
+        sentences = []
+        for _ in range(generator.randint(2, 6)):
+            length = min(generator.randint(6, 18), words - written)
+            if length <= 0:
+                break
+            sentence = " ".join(generator.choice(WORDS) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            written += length
+        turns.append(f"Talare {generator.randint(1, 3)}: " + " ".join(sentences))
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(turns))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return sorted(values)[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def configure(config, args, workdir):
+    config.provider = args.provider
+    config.stream_responses = not args.no_stream
+    config.execution_backend = "realtime"
+    config.api_key = "simulated"
+    config.openai_api_key = "simulated"
+    config.max_retries = args.max_retries
+    config.initial_delay = args.retry_after
+    config.cache_bypass = True
+    config.cache_path = os.path.join(workdir, "responses.sqlite")
+    config.runs_dir = os.path.join(workdir, "runs")
+    config.metrics_dir = os.path.join(workdir, "metrics")
+    config.metrics_enabled = True
+    config.prometheus_textfile = None
+    if args.workers:
+        config.batch_workers = args.workers
+    if not args.client_limits:
+        # The simulated server sets the pace; the client's own limits would
+        # otherwise throttle everything to the configured tokens per minute.
+        config.requests_per_minute = 10 ** 9
+        config.request_burst = 10 ** 6
+        config.input_tokens_per_minute = 10 ** 12
+        config.output_tokens_per_minute = 10 ** 12
+    return config
+
+
+def run_size(args, server, words):
+    from config import Config
+    from document_processor import DocumentProcessor
+    from main import create_processor
+    from scheduler import DocumentScheduler
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        config = configure(Config(), args, workdir)
+        paths = []
+        for i in range(args.docs):
+            path = os.path.join(workdir, f"transcript_{words}_{i}.txt")
+            write_transcript(path, words, seed=words + i)
+            paths.append(path)
+        
+        processor, client, response_cache = create_processor(config)
+        # Metrics drop a run's records once it is finished; keep its calls for
+        # the latency percentiles
+        finished_calls = []
+        finish_run = processor.metrics.finish_run
+        
+        def keep_calls(run):
+            with processor.metrics.lock:
+                finished_calls.extend(call for call in processor.metrics.calls if call["run"] == run)
+            finish_run(run)
+        
+        processor.metrics.finish_run = keep_calls
+        scheduler = DocumentScheduler(processor.process_document, DocumentProcessor.find_output, config.batch_workers, client.usage_totals)
+        server.reset_counts()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output if not args.verbose else sys.stdout):
+            summary = scheduler.run(paths, skip_done=False)
+        response_cache.close()
+        
+        calls = [call for call in finished_calls if not call["cache_hit"]]
+        latencies = [call["duration"] for call in calls]
+        return {
+            "words": words,
+            "documents": args.docs,
+            "failed": summary["failed"],
+            "documents_per_minute": summary["documents_per_minute"],
+            "elapsed_seconds": summary["elapsed_seconds"],
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "pipeline_calls": len(calls),
+            "retries": sum(call["retries"] for call in calls),
+            "prompt_cache_hit_rate": processor.metrics.summary()["totals"]["prompt_cache_hit_rate"],
+            "server_requests": dict(server.counts),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full pipeline against a simulated LLM HTTP server.")
+    parser.add_argument("--provider", choices=["anthropic", "openai"], default="anthropic")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated transcript sizes in words")
+    parser.add_argument("--docs", type=int, default=2, help="Documents per size")
+    parser.add_argument("--workers", type=int, default=None, help="Documents processed at the same time")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per API call")
+    parser.add_argument("--rate-limit-share", type=float, default=0.02, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="retry-after seconds sent with each 429")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--section-words", type=int, default=400, help="Words per section in split responses")
+    parser.add_argument("--expansion-factor", type=float, default=1.5, help="Expanded words per original word")
+    parser.add_argument("--no-stream", action="store_true", help="Use plain responses instead of streaming")
+    parser.add_argument("--client-limits", action="store_true", help="Keep the configured client-side rate limits")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+    
+    server = SimulatedLLMServer(args.latency, args.rate_limit_share, args.retry_after, args.section_words, args.expansion_factor)
+    with server:
+        # The SDKs read their endpoint from these when no base_url is passed
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        os.environ["OPENAI_BASE_URL"] = server.url + "/v1"
+        print(f"Simulated {args.provider} server at {server.url}, {args.latency * 1000:.0f} ms per call, "
+              f"{args.rate_limit_share:.0%} rate limited")
+        
+        results = []
+        for words in (int(size) for size in args.sizes.split(",")):
+            result = run_size(args, server, words)
+            results.append(result)
+            requests = result["server_requests"]
+            print(f"\n{words} words x {result['documents']} documents")
+            print(f"  throughput:   {result['documents_per_minute']:.2f} docs/min ({result['elapsed_seconds']:.1f} s)")
+            print(f"  API latency:  p50 {result['latency_p50'] * 1000:.0f} ms, p95 {result['latency_p95'] * 1000:.0f} ms")
+            print(f"  API calls:    {result['pipeline_calls']} ({requests['split']} split, {requests['expand']} expand, "
+                  f"{requests['combine']} combine), {requests['rate_limited']} rate limited, {result['retries']} retried")
+            print(f"  prompt cache: {result['prompt_cache_hit_rate']:.0%} of prompt tokens read from cache")
+            if result["failed"]:
+                print(f"  failed:       {result['failed']} documents")
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
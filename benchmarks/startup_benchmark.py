@@ -0,0 +1,71 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ANTHROPIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anthropic_api")
+
+# Each snippet runs in a fresh interpreter and prints its own elapsed time, so
+# interpreter start-up itself is not part of the measurement.
+SNIPPETS = {
+    "import main": "import main",
+    "create processor": (
+        "from config import Config\n"
+        "from main import create_processor\n"
+        "create_processor(Config())"
+    ),
+    "first count_tokens": (
+        "from config import Config\n"
+        "from tokenizer import get_token_counter\n"
+        "config = Config()\n"
+        "get_token_counter(config.tokenizer_backend, config.tokenizer_path).count_tokens('Hej och välkommen')"
+    ),
+}
+
+
+def measure(snippet, backend):
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{snippet}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    env = dict(os.environ, TOKENIZER_BACKEND=backend)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ANTHROPIC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure start-up and first-token-count time in fresh interpreters.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["auto", "approximate"])
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="Exit with an error if 'import main' takes longer than this (median)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'backend':>12} {'step':>20} {'median (s)':>11} {'min (s)':>9}")
+    for backend in args.backends:
+        for name, snippet in SNIPPETS.items():
+            times = [measure(snippet, backend) for _ in range(args.repeat)]
+            median = statistics.median(times)
+            print(f"{backend:>12} {name:>20} {median:>11.3f} {min(times):>9.3f}")
+            if name == "import main" and args.max_import_seconds is not None and median > args.max_import_seconds:
+                failed = True
+
+    if failed:
+        print(f"Start-up regression: importing main took longer than {args.max_import_seconds} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+import argparse
+
+from application import Application
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Process every transcript in a directory or glob with GPT.")
+    parser.add_argument("inputs", nargs="+", help="Directories (all .txt files) or glob patterns, or - to read one transcript from standard input")
+    parser.add_argument("--workers", type=int, default=None, help="Documents processed at the same time")
+    parser.add_argument("--priority", help="File listing documents to process first, one per line")
+    parser.add_argument("--force", action="store_true", help="Process documents that already have an output file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Process a batch of documents without prompting for input
+    """
+    args = parse_args(argv)
+    app = Application()
+    app.initialize()
+    # Imported once the application has put the shared pipeline on the path
+    from document_processor import DocumentProcessor
+    from input_reader import STDIN
+    from main import print_cache_stats
+    from scheduler import DocumentScheduler
+
+    if args.inputs == [STDIN]:
+        # A piped transcript is processed on its own and saved in the working directory
+        result = app.processor.process_document(STDIN)
+        print_cache_stats(app.config, app.response_cache, app.gpt_client)
+        return 0 if result else 1
+
+    paths = []
+    for pattern in args.inputs:
+        paths.extend(path for path in DocumentScheduler.collect(pattern) if path not in paths)
+
+    priority = None
+    if args.priority:
+        with open(args.priority, 'r', encoding='utf-8') as file:
+            priority = [line.strip() for line in file if line.strip()]
+
+    # All documents share the application's processor, and with it one client,
+    # rate limiter and cache
+    scheduler = DocumentScheduler(
+        app.processor.process_document,
+        DocumentProcessor.find_output,
+        args.workers or app.config.batch_workers,
+        app.gpt_client.usage_totals
+    )
+    summary = scheduler.run(DocumentScheduler.order(paths, priority), skip_done=not args.force)
+    print_cache_stats(app.config, app.response_cache, app.gpt_client)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules import each other by name, as when run from anthropic_api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "anthropic_api"))
+
+from config import Config
+from document_processor import DocumentProcessor
+from fake_client import FakeClient
+from rate_limiter import RateLimiter
+from text_processor import TextChunker
+from tokenizer import get_token_counter
+
+WORDS = "alfa beta gamma delta epsilon zeta eta theta".split()
+
+
+@pytest.fixture
+def config(tmp_path):
+    # The fake provider with limits that never make a test wait, small chunks
+    # and combination groups so a short transcript makes many calls, and
+    # everything the pipeline writes kept under tmp_path
+    config = Config()
+    config.provider = "fake"
+    config.execution_backend = "realtime"
+    config.tokenizer_backend = "approximate"
+    config.requests_per_minute = 10**6
+    config.request_burst = 10**5
+    config.input_tokens_per_minute = 10**12
+    config.output_tokens_per_minute = 10**12
+    config.target_token_count = 300
+    config.combine_token_budget = 400
+    config.cache_bypass = True
+    config.cache_path = str(tmp_path / "cache" / "responses.sqlite")
+    config.runs_dir = str(tmp_path / "runs")
+    config.metrics_dir = str(tmp_path / "metrics")
+    config.service_jobs_dir = str(tmp_path / "jobs")
+    config.prometheus_textfile = None
+    return config
+
+
+@pytest.fixture
+def paragraphs():
+    # Speaker turns of 60 words; the fake model makes each one a section
+    rng = random.Random(3)
+    return [f"Talare {i % 3}: " + " ".join(rng.choice(WORDS) for _ in range(60)) + "." for i in range(40)]
+
+
+@pytest.fixture
+def transcript(tmp_path, paragraphs):
+    path = tmp_path / "transcript.txt"
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def build_processor(config):
+    # Returns a function that builds a processor around a client of the given
+    # class; further keyword arguments go to the client
+    def build(client_class=FakeClient, batch_backend=None, metrics=None, **client_kwargs):
+        token_counter = get_token_counter(config.tokenizer_backend)
+        client = client_class(config, RateLimiter(config), token_counter, None, metrics, **client_kwargs)
+        processor = DocumentProcessor(
+            config, token_counter, TextChunker(token_counter, config), client, batch_backend, metrics
+        )
+        return processor, client
+
+    return build
+
+
+@pytest.fixture
+def assert_in_order():
+    # Checks that every paragraph is in the output, in the order of the input
+    def check(output, paragraphs):
+        positions = [output.find(paragraph) for paragraph in paragraphs]
+        assert -1 not in positions
+        assert positions == sorted(positions)
+
+    return check
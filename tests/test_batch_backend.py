@@ -0,0 +1,97 @@
+import os
+
+from batch_backend import MessageBatchBackend
+from checkpoint import RunCheckpoint
+from fake_batches import FakeMessageBatches
+from fake_client import FakeClient
+
+
+def build_batch_processor(config, build_processor, fail_if=None, malformed_if=None):
+    # A processor on the batch backend, whose requests the fake client answers
+    # unless fail_if(prompt) says the request errors or malformed_if(prompt)
+    # says it succeeds with an empty answer
+    answer = FakeClient(config, None)
+
+    def respond(params):
+        prompt = params["messages"][0]["content"]
+        if fail_if and fail_if(prompt):
+            raise RuntimeError("Simulated failure")
+        if malformed_if and malformed_if(prompt):
+            return "EXPANDED_CONTENT:\n"
+        return answer._respond(prompt, None)[0]
+
+    batches = FakeMessageBatches(respond, polls_until_done=2)
+    backend = MessageBatchBackend(config, batches, sleep=lambda seconds: None)
+    processor, _ = build_processor(batch_backend=backend)
+    return processor, batches
+
+
+def submitted_prompts(batches):
+    return [[request["params"]["messages"][0]["content"] for request in batch["requests"]] for batch in batches.batches.values()]
+
+
+def saved_units(config, transcript, stage):
+    stage_dir = os.path.join(RunCheckpoint(config.runs_dir, transcript).run_dir, stage)
+    return len(os.listdir(stage_dir)) if os.path.isdir(stage_dir) else 0
+
+
+def test_staged_run_processes_the_document(config, build_processor, transcript, paragraphs, assert_in_order):
+    processor, batches = build_batch_processor(config, build_processor)
+
+    output_path = processor.process_document(transcript)
+
+    assert output_path is not None
+    # One batch per stage: splits, expansions and combinations
+    assert len(batches.batches) == 3
+    with open(output_path, encoding="utf-8") as file:
+        assert_in_order(file.read(), paragraphs)
+
+
+def test_failed_request_is_the_only_one_resubmitted(config, build_processor, transcript, paragraphs, assert_in_order):
+    failing = paragraphs[17]
+
+    def expansion_of_failing(prompt):
+        return "Originaltext:" in prompt and failing in prompt
+
+    processor, batches = build_batch_processor(config, build_processor, expansion_of_failing)
+    assert processor.process_document(transcript) is None
+
+    # Splits and the expansions that succeeded are checkpointed; nothing was combined
+    split_prompts, expansion_prompts = submitted_prompts(batches)
+    assert saved_units(config, transcript, "split") == len(split_prompts)
+    assert saved_units(config, transcript, "expanded") == len(expansion_prompts) - 1
+    assert saved_units(config, transcript, "combined") == 0
+
+    processor, batches = build_batch_processor(config, build_processor)
+    output_path = processor.process_document(transcript)
+    assert output_path is not None
+
+    expansion_batch, combination_batch = submitted_prompts(batches)
+    assert expansion_batch == [prompt for prompt in expansion_prompts if expansion_of_failing(prompt)]
+    assert combination_batch
+    with open(output_path, encoding="utf-8") as file:
+        assert_in_order(file.read(), paragraphs)
+
+
+def test_malformed_response_fails_only_its_own_request(config, build_processor, transcript, paragraphs, assert_in_order):
+    first = paragraphs[0]
+
+    def expansion_of_first(prompt):
+        return "Originaltext:" in prompt and first in prompt
+
+    processor, batches = build_batch_processor(config, build_processor, malformed_if=expansion_of_first)
+    assert processor.process_document(transcript) is None
+
+    # Every expansion after the malformed one in the batch is still checkpointed
+    _, expansion_prompts = submitted_prompts(batches)
+    assert expansion_of_first(expansion_prompts[0])
+    assert saved_units(config, transcript, "expanded") == len(expansion_prompts) - 1
+
+    processor, batches = build_batch_processor(config, build_processor)
+    output_path = processor.process_document(transcript)
+    assert output_path is not None
+
+    expansion_batch, _ = submitted_prompts(batches)
+    assert expansion_batch == expansion_prompts[:1]
+    with open(output_path, encoding="utf-8") as file:
+        assert_in_order(file.read(), paragraphs)
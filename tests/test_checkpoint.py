@@ -0,0 +1,124 @@
+import shutil
+from collections import Counter
+
+import pytest
+
+import document_processor
+from checkpoint import RunCheckpoint
+from fake_client import FakeClient
+
+
+class FlakyClient(FakeClient):
+    # Fails the fail_on-th expansion call and counts the calls that succeed by
+    # checkpoint stage
+    def __init__(self, *args, fail_on=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_on = fail_on
+        self.expansions = 0
+        self.stages = Counter()
+
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        stage = self._stage(prompt)
+        if stage == "expanded":
+            self.expansions += 1
+            if self.expansions == self.fail_on:
+                raise RuntimeError("Simulated failure")
+        self.stages[stage] += 1
+        return await super()._send_async(prompt, on_text, system, max_tokens, prefill)
+
+    @staticmethod
+    def _stage(prompt):
+        if "Här är texten att bearbeta:" in prompt:
+            return "split"
+        if "Originaltext:" in prompt:
+            return "expanded"
+        return "combined"
+
+
+@pytest.fixture
+def checkpoints(monkeypatch):
+    # Every RunCheckpoint the processor creates, so a test can read what it reused
+    created = []
+
+    class RecordingCheckpoint(RunCheckpoint):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(document_processor, "RunCheckpoint", RecordingCheckpoint)
+    return created
+
+
+def full_run_calls(build_processor, transcript, tmp_path):
+    # Calls by stage for the whole document, run from a copy so it has its own
+    # checkpoint and output
+    reference = tmp_path / "reference" / "transcript.txt"
+    reference.parent.mkdir()
+    shutil.copy(transcript, reference)
+    processor, client = build_processor(FlakyClient)
+    assert processor.process_document(str(reference)) is not None
+    return client.stages
+
+
+@pytest.mark.parametrize("fail_on", [1, 7, 20])
+def test_resume_only_redoes_what_failed(build_processor, transcript, paragraphs, tmp_path, checkpoints, assert_in_order, fail_on):
+    expected = full_run_calls(build_processor, transcript, tmp_path)
+
+    processor, client = build_processor(FlakyClient, fail_on=fail_on)
+    assert processor.process_document(transcript) is None
+    assert document_processor.DocumentProcessor.find_output(transcript) is None
+    first_run = Counter(client.stages)
+
+    processor, client = build_processor(FlakyClient)
+    output_path = processor.process_document(transcript)
+    assert output_path is not None
+
+    # The failed expansion and its combination are made again; everything the
+    # first run finished is reused instead of being sent again
+    resumed = checkpoints[-1]
+    assert client.stages["expanded"] >= 1
+    assert client.stages["combined"] >= 1
+    for stage in RunCheckpoint.STAGES:
+        assert resumed.reused[stage] == first_run[stage]
+        assert client.stages[stage] + first_run[stage] == expected[stage]
+    with open(output_path, encoding="utf-8") as file:
+        assert_in_order(file.read(), paragraphs)
+
+
+def test_completed_run_reuses_everything(build_processor, transcript, checkpoints):
+    processor, client = build_processor(FlakyClient)
+    assert processor.process_document(transcript) is not None
+    first_run = Counter(client.stages)
+
+    processor, client = build_processor(FlakyClient)
+    assert processor.process_document(transcript) is not None
+
+    assert sum(client.stages.values()) == 0
+    assert checkpoints[-1].reused == dict(first_run)
+
+
+class TitledClient(FlakyClient):
+    # Titles the document after the start of its first chunk, so an edit
+    # there changes the title
+    def _split_response(self, prompt):
+        text = prompt.split("Här är texten att bearbeta:", 1)[1].split()
+        return " ".join(text[:4]) + super()._split_response(prompt)[len("Fake document"):]
+
+
+def test_title_change_only_redoes_the_edited_section(build_processor, transcript, paragraphs, checkpoints):
+    processor, client = build_processor(TitledClient)
+    assert processor.process_document(transcript) is not None
+
+    # Same length, so the chunk boundaries stay where they were
+    edited = paragraphs[0].replace("Talare 0: ", "Talare 9: ", 1)
+    with open(transcript, "w", encoding="utf-8") as file:
+        file.write("\n\n".join([edited] + paragraphs[1:]))
+    processor, client = build_processor(TitledClient)
+    output_path = processor.process_document(transcript)
+
+    assert output_path is not None
+    with open(output_path, encoding="utf-8") as file:
+        assert "Talare 9:" in file.read()
+    assert client.stages["split"] == 1
+    assert client.stages["expanded"] == 1
+    assert checkpoints[-1].reused["expanded"] == len(paragraphs) - 1
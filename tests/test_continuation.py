@@ -0,0 +1,76 @@
+import asyncio
+import random
+
+import pytest
+
+from fake_client import FakeClient
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+
+class ReplyingClient(FakeClient):
+    # Continues like chat completions: a new reply that starts at the next
+    # word, after a response that stopped on the whitespace following one
+    CONTINUES_PREFILL = False
+
+    def _respond(self, prompt, on_text, system=None, max_tokens=None, prefill=None):
+        text, usage, _ = super()._respond(prompt, None, system, None, prefill)
+        if prefill:
+            text = text.lstrip()
+        end = len(text) if max_tokens is None else max_tokens * 4
+        while end < len(text) and text[end].isspace():
+            end += 1
+        return text[:end], usage, end < len(text)
+
+
+def build_client(config, client_class, max_tokens, cache=None):
+    client = client_class(config, RateLimiter(config), cache=cache, latency=0)
+    client.max_tokens = max_tokens
+    return client
+
+
+def expansion_prompt(body):
+    return "Originaltext:\n" + body
+
+
+def random_body(seed):
+    # Words, spaces, line breaks and paragraphs, so the cuts fall on every kind
+    # of whitespace
+    rng = random.Random(seed)
+    pieces = []
+    for _ in range(rng.randint(20, 60)):
+        pieces.append(rng.choice(["ord", "svar", "a", "fotosyntes", "Talare 1:", "slut."]))
+        pieces.append(rng.choice([" ", " ", "  ", "\n", "\n\n"]))
+    return "".join(pieces).strip()
+
+
+@pytest.mark.parametrize("client_class", [FakeClient, ReplyingClient])
+@pytest.mark.parametrize("seed", range(20))
+def test_cut_off_response_is_continued_with_its_whitespace(config, client_class, seed):
+    config.max_continuations = 1000
+    body = random_body(seed)
+    client = build_client(config, client_class, max_tokens=random.Random(seed).randint(1, 6))
+
+    text = asyncio.run(client.create_message_async(expansion_prompt(body)))
+
+    assert text == "EXPANDED_CONTENT:\n" + body
+    assert client.calls > 1
+
+
+@pytest.mark.parametrize("client_class", [FakeClient, ReplyingClient])
+def test_max_continuations_keeps_the_partial_text(config, tmp_path, capsys, client_class):
+    config.max_continuations = 2
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    client = build_client(config, client_class, max_tokens=5, cache=cache)
+    prompt = expansion_prompt(random_body(0))
+
+    text = asyncio.run(client.create_message_async(prompt))
+
+    assert client.calls == 3
+    assert 0 < len(text) < len("EXPANDED_CONTENT:\n" + random_body(0))
+    assert ("EXPANDED_CONTENT:\n" + random_body(0)).startswith(text.rstrip())
+    assert "no continuations are left" in capsys.readouterr().out
+    # A response that is still cut off is not cached
+    assert cache.stats()["size_bytes"] == 0
+    asyncio.run(client.create_message_async(prompt))
+    assert client.calls == 6
@@ -0,0 +1,94 @@
+import codecs
+import io
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from input_reader import InputReader, STDIN
+from text_processor import TextChunker
+from tokenizer import get_token_counter
+
+TEXT = "Talare 1: Hej och välkomna.\nTalare 2: Tack, ärade ordförande – 20 °C idag.\n"
+
+
+def write_bytes(tmp_path, data):
+    path = tmp_path / "transcript.txt"
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("encoded", [
+    codecs.BOM_UTF8 + TEXT.encode("utf-8"),
+    codecs.BOM_UTF16_LE + TEXT.encode("utf-16-le"),
+    codecs.BOM_UTF16_BE + TEXT.encode("utf-16-be"),
+    codecs.BOM_UTF32_LE + TEXT.encode("utf-32-le"),
+    codecs.BOM_UTF32_BE + TEXT.encode("utf-32-be"),
+], ids=["utf-8", "utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be"])
+@pytest.mark.parametrize("block_size", [1, 3, 7, 1024])
+def test_byte_order_mark_sets_the_encoding(tmp_path, capsys, encoded, block_size):
+    path = write_bytes(tmp_path, encoded)
+
+    assert InputReader(block_size).read_text(path) == TEXT
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 16, 1024])
+def test_utf8_without_a_mark(tmp_path, block_size):
+    path = write_bytes(tmp_path, TEXT.encode("utf-8"))
+
+    assert InputReader(block_size).read_text(path) == TEXT
+
+
+@pytest.mark.parametrize("block_size", [4, 16, 64, 1024])
+def test_falls_back_after_an_all_ascii_first_block(tmp_path, capsys, block_size):
+    text = "Talare 1: " + "ascii " * 20 + "och sedan smörgåsbord för 5 €.\n"
+    path = write_bytes(tmp_path, text.encode("cp1252"))
+
+    assert InputReader(block_size, "cp1252").read_text(path) == text
+    assert "Reading it as cp1252" in capsys.readouterr().out
+
+
+def test_invalid_bytes_after_utf8_text_are_replaced(tmp_path, capsys):
+    path = write_bytes(tmp_path, "Smörgås ".encode("utf-8") + "och smörgås".encode("cp1252"))
+
+    assert InputReader(4, "cp1252").read_text(path) == "Smörgås och sm�rg�s"
+    assert "Replacing them" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("block_size", range(1, 16))
+def test_line_endings_split_across_blocks(tmp_path, block_size):
+    path = write_bytes(tmp_path, b"a\r\nb\r\n\r\nc\rd\r\n\r")
+
+    blocks = list(InputReader(block_size).read_blocks(path))
+
+    assert "".join(blocks) == "a\nb\n\nc\nd\n\n"
+    assert not any("\r" in block for block in blocks)
+
+
+def test_reads_standard_input(monkeypatch):
+    stdin = SimpleNamespace(buffer=io.BytesIO(TEXT.replace("\n", "\r\n").encode("utf-8")))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    reader = InputReader(8)
+
+    assert reader.streams(STDIN)
+    assert reader.read_text(STDIN) == TEXT
+
+
+def test_streams_only_large_files(tmp_path):
+    path = write_bytes(tmp_path, b"x" * 2048)
+
+    assert not InputReader(stream_input_mb=1).streams(path)
+    assert InputReader(stream_input_mb=1 / 1024).streams(path)
+
+
+@pytest.mark.parametrize("block_size", [1, 100, 4096, 50000, 10**6])
+def test_iter_chunks_matches_chunk_text(tmp_path, config, paragraphs, block_size):
+    text = "\n\n".join(paragraphs * 3)
+    path = write_bytes(tmp_path, text.encode("utf-8"))
+    chunker = TextChunker(get_token_counter("approximate"), config)
+
+    chunks = list(chunker.iter_chunks(InputReader(block_size).read_blocks(path)))
+
+    assert chunks == chunker.chunk_text(text)
+    assert len(chunks) > 3
@@ -0,0 +1,91 @@
+import asyncio
+import random
+
+from document_processor import CombinationGroups
+from fake_client import FakeClient
+from tokenizer import get_token_counter
+
+
+class SlowClient(FakeClient):
+    # Answers each call after a random delay, so calls finish in a different
+    # order than they started, and keeps track of how many are in flight
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rng = random.Random(11)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = []
+        self.finished = []
+
+    async def _send_async(self, prompt, on_text, system, max_tokens, prefill=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.started.append(prompt)
+        try:
+            await asyncio.sleep(self.rng.uniform(0, 0.02))
+            return self._respond(prompt, on_text, system, max_tokens, prefill)
+        finally:
+            self.in_flight -= 1
+            self.finished.append(prompt)
+
+
+class UntitledClient(SlowClient):
+    # Splits chunks without reporting a document title
+    def _split_response(self, prompt):
+        return super()._split_response(prompt).split("\n", 1)[1]
+
+
+def test_output_keeps_section_order_when_calls_finish_out_of_order(build_processor, transcript, paragraphs, assert_in_order):
+    processor, client = build_processor(SlowClient)
+
+    output_path = processor.process_document(transcript)
+
+    assert output_path is not None
+    assert client.finished != client.started
+    with open(output_path, encoding="utf-8") as file:
+        assert_in_order(file.read(), paragraphs)
+
+
+def test_calls_in_flight_never_exceed_max_concurrent_requests(config, build_processor, transcript):
+    config.max_concurrent_requests = 3
+    processor, client = build_processor(SlowClient)
+
+    assert processor.process_document(transcript) is not None
+    assert client.max_in_flight == config.max_concurrent_requests
+
+
+def test_read_ahead_stays_bounded_without_a_document_title(config, build_processor, paragraphs, assert_in_order):
+    config.max_concurrent_requests = 2
+    processor, _ = build_processor(UntitledClient)
+    partials = []
+    lag = []
+
+    def read_chunks():
+        # One paragraph, and so one partial, per chunk
+        for paragraph in paragraphs:
+            lag.append(len(lag) - len(partials))
+            yield paragraph
+
+    asyncio.run(processor._process_pipelined(read_chunks(), None, partials.append))
+
+    assert max(lag) < 2 * config.max_concurrent_requests
+    assert_in_order("\n\n".join(partials), paragraphs)
+
+
+def test_combination_groups_stay_within_budget_and_chunk():
+    token_counter = get_token_counter("approximate")
+    sections = [
+        {"title": f"Del {i}", "expanded_content": "ord " * 50, "chunk": i // 5}
+        for i in range(12)
+    ]
+    budget = 3 * token_counter.count_tokens("ord " * 50)
+    groups = CombinationGroups(token_counter, budget)
+
+    packed = [group for group in map(groups.add, sections) if group]
+    packed.append(groups.close())
+
+    assert [len(group) for group in packed] == [3, 2, 3, 2, 2]
+    assert [section for group in packed for section in group] == sections
+    for group in packed:
+        assert len({section["chunk"] for section in group}) == 1
+    assert groups.close() is None
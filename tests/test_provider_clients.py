@@ -0,0 +1,234 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api_client import ClaudeClient
+from gpt_client import GPTClient
+from rate_limiter import RateLimiter
+
+HEADERS = {"anthropic-ratelimit-requests-limit": "120"}
+
+
+def fragments(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubMessages:
+    # Stands in for AsyncAnthropic().messages. Each call answers with the next
+    # (text, stop_reason) reply and records its parameters.
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _message(self, params):
+        self.requests.append(params)
+        text, stop_reason = self.replies.pop(0)
+        usage = SimpleNamespace(input_tokens=100, output_tokens=len(text), cache_read_input_tokens=30, cache_creation_input_tokens=5)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], usage=usage, stop_reason=stop_reason)
+
+    async def _create_raw(self, **params):
+        message = self._message(params)
+
+        async def parse():
+            return message
+
+        return SimpleNamespace(headers=HEADERS, parse=parse)
+
+    def stream(self, **params):
+        return StubStream(self._message(params))
+
+
+class StubStream:
+    # Stands in for the messages.stream() context manager
+    def __init__(self, message):
+        self.message = message
+        self.response = SimpleNamespace(headers=HEADERS)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        async def text_stream():
+            for fragment in fragments(self.message.content[0].text):
+                yield fragment
+        return text_stream()
+
+    async def get_final_message(self):
+        return self.message
+
+
+class StubCompletions:
+    # Stands in for AsyncOpenAI().chat.completions, in the same way
+    def __init__(self, replies, cached_tokens=40):
+        self.replies = list(replies)
+        self.requests = []
+        self.cached_tokens = cached_tokens
+
+    async def create(self, **params):
+        self.requests.append(params)
+        text, finish_reason = self.replies.pop(0)
+        usage = SimpleNamespace(
+            prompt_tokens=100,
+            completion_tokens=len(text),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens)
+        )
+        if params.get("stream"):
+            return self._chunks(text, finish_reason, usage)
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=usage)
+
+    @staticmethod
+    async def _chunks(text, finish_reason, usage):
+        for fragment in fragments(text):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=fragment), finish_reason=None)], usage=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason=finish_reason)], usage=None)
+        # With include_usage, the last chunk has the usage and no choices
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+def claude_client(config, monkeypatch, replies):
+    client = ClaudeClient(config, RateLimiter(config))
+    messages = StubMessages(replies)
+    monkeypatch.setattr(client, "_create_async_client", lambda: SimpleNamespace(messages=messages))
+    return client, messages
+
+
+def gpt_client(config, monkeypatch, replies, **kwargs):
+    client = GPTClient(config, RateLimiter(config))
+    completions = StubCompletions(replies, **kwargs)
+    chat = SimpleNamespace(completions=completions)
+    monkeypatch.setattr(client, "_create_async_client", lambda: SimpleNamespace(chat=chat))
+    return client, completions
+
+
+def send(client, prompt="Hej", system=None):
+    received = []
+    text = asyncio.run(client.create_message_async(prompt, on_text=received.append, system=system))
+    return text, received
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_claude_response_and_usage(config, monkeypatch, stream):
+    config.stream_responses = stream
+    client, messages = claude_client(config, monkeypatch, [("Ett svar från Claude.", "end_turn")])
+
+    text, received = send(client, system="Instruktioner")
+
+    assert text == "Ett svar från Claude."
+    assert received == (fragments(text) if stream else [])
+    assert client.usage == {
+        "input_tokens": 100,
+        "output_tokens": len(text),
+        "cache_read_input_tokens": 30,
+        "cache_creation_input_tokens": 5,
+    }
+    # The rate limit headers of the response reach the shared limiter
+    assert client.rate_limiter.buckets["requests"].refill_per_second == 2
+
+    request = messages.requests[0]
+    assert request["model"] == config.model
+    assert request["messages"] == [{"role": "user", "content": "Hej"}]
+    assert request["system"] == [{"type": "text", "text": "Instruktioner", "cache_control": {"type": "ephemeral"}}]
+
+
+def test_claude_system_prompt_without_caching(config, monkeypatch):
+    config.prompt_caching = False
+    client, messages = claude_client(config, monkeypatch, [("Svar.", "end_turn")])
+
+    send(client, system="Instruktioner")
+
+    assert messages.requests[0]["system"] == [{"type": "text", "text": "Instruktioner"}]
+
+
+def test_claude_usage_without_cache_fields(config, monkeypatch):
+    client, messages = claude_client(config, monkeypatch, [])
+    response = SimpleNamespace(usage=SimpleNamespace(input_tokens=7, output_tokens=3))
+
+    assert client._response_usage(response) == {
+        "input_tokens": 7,
+        "output_tokens": 3,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 0,
+    }
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_claude_continues_after_max_tokens_with_a_prefill(config, monkeypatch, stream):
+    config.stream_responses = stream
+    client, messages = claude_client(config, monkeypatch, [("Första delen ", "max_tokens"), (" andra delen.", "end_turn")])
+
+    text, _ = send(client)
+
+    assert text == "Första delen andra delen."
+    assert messages.requests[1]["messages"] == [
+        {"role": "user", "content": "Hej"},
+        {"role": "assistant", "content": "Första delen"},
+    ]
+    assert messages.requests[1]["max_tokens"] == client.max_tokens
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_gpt_response_and_usage(config, monkeypatch, stream):
+    config.stream_responses = stream
+    client, completions = gpt_client(config, monkeypatch, [("Ett svar från GPT.", "stop")])
+
+    text, received = send(client, system="Instruktioner")
+
+    assert text == "Ett svar från GPT."
+    assert received == (fragments(text) if stream else [])
+    # prompt_tokens includes the cached tokens, which are counted apart
+    assert client.usage == {
+        "input_tokens": 60,
+        "output_tokens": len(text),
+        "cache_read_input_tokens": 40,
+        "cache_creation_input_tokens": 0,
+    }
+
+    request = completions.requests[0]
+    assert request["model"] == config.openai_model
+    assert request["messages"] == [
+        {"role": "system", "content": "Instruktioner"},
+        {"role": "user", "content": "Hej"},
+    ]
+    if stream:
+        assert request["stream"] is True
+        assert request["stream_options"] == {"include_usage": True}
+    else:
+        assert "stream" not in request
+
+
+def test_gpt_usage_without_details(config, monkeypatch):
+    client, _ = gpt_client(config, monkeypatch, [])
+
+    assert client._response_usage(None) == client._usage()
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=4)
+    assert client._response_usage(usage)["input_tokens"] == 12
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_gpt_continues_after_length_with_a_new_reply(config, monkeypatch, stream):
+    config.stream_responses = stream
+    client, completions = gpt_client(config, monkeypatch, [("Första delen ", "length"), ("andra delen.", "stop")])
+
+    text, _ = send(client)
+
+    assert text == "Första delen andra delen."
+    assert completions.requests[1]["messages"] == [
+        {"role": "user", "content": "Hej"},
+        {"role": "assistant", "content": "Första delen "},
+        {"role": "user", "content": GPTClient.CONTINUE_PROMPT},
+    ]
+
+
+def test_sdk_clients_leave_retries_to_the_retry_policy(config):
+    config.api_key = "test"
+    config.openai_api_key = "test"
+
+    assert ClaudeClient(config, RateLimiter(config))._create_async_client().max_retries == 0
+    assert GPTClient(config, RateLimiter(config))._create_async_client().max_retries == 0
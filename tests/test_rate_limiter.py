@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config import Config
+from rate_limiter import RateLimiter
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def simulate(config, requests, input_tokens, output_tokens, latency):
+    # Sends requests one after the other through the limiter and returns the
+    # simulated time each one was sent at
+    clock = SimulatedClock()
+    limiter = RateLimiter(config, clock=clock, sleep=clock.sleep)
+    sent_at = []
+    for _ in range(requests):
+        limiter.wait_if_needed(input_tokens)
+        sent_at.append(clock.now)
+        clock.sleep(latency)
+        limiter.record_usage(input_tokens, input_tokens, output_tokens)
+    return sent_at
+
+
+def steady_state_per_minute(sent_at):
+    # Requests per minute over the second half of the run, after the initial
+    # burst has been used up
+    steady = sent_at[len(sent_at) // 2:]
+    return (len(steady) - 1) / (steady[-1] - steady[0]) * 60
+
+
+@pytest.mark.parametrize("input_tokens, output_tokens, binding", [
+    (200, 50, "requests"),
+    (1500, 3000, "output"),
+    (25000, 4000, "input"),
+])
+@pytest.mark.parametrize("latency", [0.0, 0.5])
+def test_steady_state_throughput_matches_the_limits(capsys, input_tokens, output_tokens, binding, latency):
+    config = Config()
+    sent_at = simulate(config, 400, input_tokens, output_tokens, latency)
+    requests_per_minute = steady_state_per_minute(sent_at)
+    rates = {
+        "requests": (requests_per_minute, config.requests_per_minute),
+        "input": (requests_per_minute * input_tokens, config.input_tokens_per_minute),
+        "output": (requests_per_minute * output_tokens, config.output_tokens_per_minute),
+    }
+
+    # The limit that binds is used to within 2%; the others are never exceeded
+    rate, limit = rates.pop(binding)
+    assert rate == pytest.approx(limit, rel=0.02)
+    for rate, limit in rates.values():
+        assert rate <= limit * 1.02
+
+    # Throttling is reported about once a simulated minute, not per request
+    messages = capsys.readouterr().out.count("Rate limit approached")
+    assert messages <= sent_at[-1] / RateLimiter.REPORT_INTERVAL + 1
+
+
+def test_retry_after_blocks_every_request():
+    clock = SimulatedClock()
+    limiter = RateLimiter(Config(), clock=clock, sleep=clock.sleep)
+
+    assert limiter.update_from_headers({"retry-after": "7"}) == 7.0
+    assert limiter.reserve() == pytest.approx(7.0)
+    clock.sleep(7)
+    assert limiter.reserve() == 0.0
+
+
+@pytest.mark.parametrize("bucket", ["requests", "input-tokens", "output-tokens"])
+def test_no_remaining_capacity_waits_for_the_reset(bucket):
+    clock = SimulatedClock()
+    limiter = RateLimiter(Config(), clock=clock, sleep=clock.sleep)
+    reset_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    limiter.update_from_headers({
+        f"anthropic-ratelimit-{bucket}-remaining": "0",
+        f"anthropic-ratelimit-{bucket}-reset": reset_at.isoformat().replace("+00:00", "Z"),
+    })
+
+    assert limiter.reserve() == pytest.approx(30, abs=1)
+
+
+def test_limit_headers_replace_the_configured_rates():
+    clock = SimulatedClock()
+    config = Config()
+    limiter = RateLimiter(config, clock=clock, sleep=clock.sleep)
+
+    limiter.update_from_headers({
+        "anthropic-ratelimit-requests-limit": "120",
+        "anthropic-ratelimit-input-tokens-limit": "80000",
+        "anthropic-ratelimit-input-tokens-remaining": "1000",
+    })
+
+    assert limiter.buckets["requests"].refill_per_second == 2
+    assert limiter.buckets["requests"].capacity == config.request_burst
+    assert limiter.buckets["input-tokens"].capacity == 80000
+    # 2000 tokens with 1000 left wait for 1000 more at 80000 per minute
+    assert limiter.reserve(2000) == pytest.approx(0.75)
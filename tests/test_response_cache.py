@@ -0,0 +1,119 @@
+import pytest
+
+from response_cache import ResponseCache
+
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache" / "responses.sqlite"), clock=clock)
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_model_max_tokens_prompt_and_system():
+    key = ResponseCache.make_key("claude", 1024, "Hej", system="Instruktioner")
+
+    assert key == ResponseCache.make_key("claude", 1024, "Hej", system="Instruktioner")
+    assert len({
+        key,
+        ResponseCache.make_key("gpt", 1024, "Hej", system="Instruktioner"),
+        ResponseCache.make_key("claude", 2048, "Hej", system="Instruktioner"),
+        ResponseCache.make_key("claude", 1024, "Hallå", system="Instruktioner"),
+        ResponseCache.make_key("claude", 1024, "Hej", system="Andra instruktioner"),
+        ResponseCache.make_key("claude", 1024, "Hej"),
+    }) == 6
+
+
+def test_key_without_a_system_prompt_is_unchanged():
+    # Entries cached before system prompts were added to the key stay valid
+    assert ResponseCache.make_key("claude", 1024, "Hej") == ResponseCache.make_key("claude", 1024, "Hej", system=None)
+
+
+def test_counts_hits_and_misses(cache):
+    key = ResponseCache.make_key("claude", 1024, "Hej")
+
+    assert cache.get(key) is None
+    cache.set(key, "Svar")
+    assert cache.get(key) == "Svar"
+    assert cache.get(key) == "Svar"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    assert stats["size_bytes"] == len("Svar")
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(path, clock=clock)
+    cache.set("key", "Svar")
+    cache.close()
+
+    cache = ResponseCache(path, clock=clock)
+    assert cache.get("key") == "Svar"
+    assert cache.stats()["size_bytes"] == len("Svar")
+    cache.close()
+
+
+def test_replacing_an_entry_keeps_the_size_right(cache):
+    cache.set("key", "kort")
+    cache.set("key", "mycket längre")
+
+    assert cache.get("key") == "mycket längre"
+    assert cache.stats()["size_bytes"] == len("mycket längre".encode("utf-8"))
+
+
+def test_expired_entries_miss_and_are_evicted(cache, clock):
+    cache.set("old", "Gammalt svar")
+    clock.now += 20 * DAY
+    cache.set("new", "Nytt svar")
+    clock.now += 11 * DAY
+
+    assert cache.get("old") is None
+    assert cache.get("new") == "Nytt svar"
+    cache.evict()
+    assert cache.stats()["size_bytes"] == len("Nytt svar")
+
+
+def test_size_limit_evicts_the_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_size_mb=300 / (1024 * 1024), clock=clock)
+    for name in ("a", "b", "c"):
+        cache.set(name, name * 100)
+        clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "a" * 100
+    clock.now += 1
+
+    cache.set("d", "d" * 100)
+
+    assert cache.get("b") is None
+    assert [cache.get(name) for name in ("a", "c", "d")] == ["a" * 100, "c" * 100, "d" * 100]
+    assert cache.stats()["size_bytes"] == 300
+    cache.close()
+
+
+def test_bypass_neither_reads_nor_writes(tmp_path):
+    path = tmp_path / "responses.sqlite"
+    cache = ResponseCache(str(path), bypass=True)
+
+    cache.set("key", "Svar")
+    assert cache.get("key") is None
+    cache.evict()
+
+    assert not path.exists()
+    assert cache.stats() == {"hits": 0, "misses": 0, "hit_rate": 0.0, "size_bytes": 0}
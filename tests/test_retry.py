@@ -0,0 +1,231 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from retry import CircuitBreaker, DeadlineExceeded, RetryBudget, RetryPolicy, is_retryable, retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class ReadTimeout(APITimeoutError):
+    pass
+
+
+def make_policy(clock, random=lambda: 0.5):
+    # Sleeping moves the fake clock forward and is recorded
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    return RetryPolicy(Config(), clock=clock, sleep=sleep, random=random), sleeps
+
+
+def failing_attempt(errors, result="ok"):
+    # Raises the given errors in turn, then returns result
+    errors = list(errors)
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return attempt, calls
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (APIError(408), True),
+    (APIError(409), True),
+    (APIError(429), True),
+    (APIError(500), True),
+    (APIError(503), True),
+    (APIError(529), True),
+    (APIError(400), False),
+    (APIError(401), False),
+    (APIError(404), False),
+    (APIError(422), False),
+    (APITimeoutError(), True),
+    (ReadTimeout(), True),
+    (ConnectionError(), True),
+    (ValueError(), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_status_code_is_read_from_the_response():
+    error = Exception("no status of its own")
+    error.response = SimpleNamespace(status_code=502, headers={})
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("headers, delay", [
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after-ms": "1500", "retry-after": "7"}, 1.5),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_retry_after(headers, delay):
+    assert retry_after(APIError(429, headers)) == delay
+
+
+@pytest.mark.parametrize("retries", range(10))
+def test_backoff_is_full_jitter_up_to_the_capped_exponential(retries):
+    config = Config()
+    cap = min(config.retry_max_delay, config.initial_delay * 2 ** retries)
+
+    assert RetryPolicy(config, random=lambda: 0.0).backoff(retries) == 0.0
+    assert RetryPolicy(config, random=lambda: 0.5).backoff(retries) == cap / 2
+    assert RetryPolicy(config, random=lambda: 0.999999).backoff(retries) == pytest.approx(cap, rel=1e-5)
+    assert RetryPolicy(config).backoff(retries) <= cap
+
+
+def test_retry_after_header_replaces_the_backoff():
+    policy, sleeps = make_policy(FakeClock())
+    attempt, calls = failing_attempt([APIError(429, {"retry-after": "7"}), APIError(503)])
+
+    assert asyncio.run(policy.call_async(attempt)) == "ok"
+    assert len(calls) == 3
+    assert sleeps == [7.0, policy.backoff(1)]
+
+
+def test_errors_that_are_not_retryable_fail_at_once():
+    policy, sleeps = make_policy(FakeClock())
+    attempt, calls = failing_attempt([APIError(400)])
+
+    with pytest.raises(APIError):
+        asyncio.run(policy.call_async(attempt))
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries():
+    policy, sleeps = make_policy(FakeClock())
+    attempt, calls = failing_attempt([APIError(500)] * 10)
+
+    with pytest.raises(APIError):
+        asyncio.run(policy.call_async(attempt, max_retries=3))
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_budget_stops_retries_that_would_end_after_the_deadline():
+    clock = FakeClock()
+    policy, sleeps = make_policy(clock)
+    budget = RetryBudget(deadline_seconds=10, clock=clock)
+    attempt, calls = failing_attempt([APIError(429, {"retry-after": "4"})] * 5)
+
+    with budget.scope(), pytest.raises(APIError):
+        asyncio.run(policy.call_async(attempt))
+    # Two 4 second waits fit in 10 seconds; a third would end after the deadline
+    assert sleeps == [4.0, 4.0]
+    assert len(calls) == 3
+    assert budget.remaining_seconds() == 2.0
+
+
+def test_no_call_starts_after_the_deadline():
+    clock = FakeClock()
+    policy, _ = make_policy(clock)
+    budget = RetryBudget(deadline_seconds=10, clock=clock)
+    attempt, calls = failing_attempt([])
+    clock.now = 10
+
+    with budget.scope(), pytest.raises(DeadlineExceeded):
+        asyncio.run(policy.call_async(attempt))
+    assert calls == []
+
+
+def test_budget_limits_retries_across_calls():
+    policy, _ = make_policy(FakeClock())
+    budget = RetryBudget(max_retries=3)
+
+    with budget.scope():
+        attempt, _ = failing_attempt([APIError(500)] * 2)
+        assert asyncio.run(policy.call_async(attempt)) == "ok"
+        # One retry is left for the second call, which needs two
+        attempt, calls = failing_attempt([APIError(500)] * 2)
+        with pytest.raises(APIError):
+            asyncio.run(policy.call_async(attempt))
+    assert len(calls) == 2
+    assert budget.retries == 3
+
+
+def test_breaker_opens_after_threshold_overloads_in_a_row():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=3, cooldown=30, clock=clock)
+
+    breaker.record_failure(overloaded=True)
+    breaker.record_failure(overloaded=True)
+    assert breaker.wait_time() == 0.0
+    breaker.record_failure(overloaded=True)
+    assert breaker.wait_time() == 30.0
+    clock.now = 20
+    assert breaker.wait_time() == 10.0
+
+
+def test_other_failures_break_the_run_of_overloads():
+    breaker = CircuitBreaker(threshold=3, cooldown=30, clock=FakeClock())
+
+    for overloaded in (True, True, False, True, True):
+        breaker.record_failure(overloaded)
+
+    assert breaker.failures == 2
+    assert breaker.wait_time() == 0.0
+
+
+def test_breaker_lets_one_probe_through_after_the_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=30, clock=clock)
+    breaker.record_failure(overloaded=True)
+    clock.now = 30
+
+    # One probe goes through; the others keep waiting for its outcome
+    assert breaker.wait_time() == 0.0
+    assert breaker.wait_time() == 1.0
+
+    # An overloaded probe opens the circuit for another cooldown
+    breaker.record_failure(overloaded=True)
+    assert breaker.wait_time() == 30.0
+
+    # A successful probe closes it
+    clock.now = 60
+    assert breaker.wait_time() == 0.0
+    breaker.record_success()
+    assert breaker.wait_time() == 0.0
+    assert breaker.wait_time() == 0.0
+
+
+def test_policy_pauses_every_call_while_the_provider_is_overloaded():
+    clock = FakeClock()
+    policy, sleeps = make_policy(clock, random=lambda: 0.0)
+    config = Config()
+    attempt, calls = failing_attempt([APIError(529)] * config.circuit_breaker_threshold)
+
+    assert asyncio.run(policy.call_async(attempt)) == "ok"
+    # The last overload opened the circuit, so the next attempt waited the cooldown
+    assert sleeps[-1] == config.circuit_breaker_cooldown
+    assert len(calls) == config.circuit_breaker_threshold + 1
+    assert policy.breaker.wait_time() == 0.0
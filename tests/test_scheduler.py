@@ -0,0 +1,75 @@
+import importlib.util
+import os
+
+import config as config_module
+import main as engine_main
+import providers
+from document_processor import DocumentProcessor
+from fake_client import FakeClient
+from rate_limiter import RateLimiter
+from scheduler import DocumentScheduler
+
+OPENAI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "openAI_api")
+
+
+def write_documents(directory, sizes):
+    directory.mkdir(exist_ok=True)
+    paths = []
+    for i, size in enumerate(sizes):
+        path = directory / f"doc{i}.txt"
+        path.write_text("\n\n".join(f"Talare {n % 2}: stycke {n} i dokument {i}." for n in range(size)), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def test_collect_skips_output_files(tmp_path):
+    paths = write_documents(tmp_path / "docs", [1, 1])
+    (tmp_path / "docs" / "doc0_processed_20240101_120000.txt").write_text("done", encoding="utf-8")
+
+    assert sorted(DocumentScheduler.collect(str(tmp_path / "docs"))) == paths
+
+
+def test_order_puts_priority_first_then_smallest(tmp_path):
+    small, large, medium = write_documents(tmp_path / "docs", [1, 30, 10])
+
+    assert DocumentScheduler.order([small, large, medium]) == [small, medium, large]
+    assert DocumentScheduler.order([small, large, medium], ["doc1.txt"]) == [large, small, medium]
+
+
+def test_openai_batch_shares_one_client_and_rate_limiter(tmp_path, config, monkeypatch):
+    # openAI_api/batch.py with every document on its own worker; the openai
+    # provider is swapped for the fake one so no request leaves the process
+    limiters = []
+    clients = []
+
+    class RecordingLimiter(RateLimiter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.reservations = 0
+            limiters.append(self)
+
+        def reserve(self, input_tokens=0):
+            self.reservations += 1
+            return super().reserve(input_tokens)
+
+    def create_fake_client(config, rate_limiter, token_counter, cache, metrics):
+        clients.append(FakeClient(config, rate_limiter, token_counter, cache, metrics))
+        return clients[-1]
+
+    monkeypatch.setattr(config_module, "Config", lambda: config)
+    monkeypatch.setattr(engine_main, "RateLimiter", RecordingLimiter)
+    monkeypatch.setitem(providers.PROVIDERS, "openai", create_fake_client)
+    monkeypatch.syspath_prepend(OPENAI_DIR)
+    spec = importlib.util.spec_from_file_location("openai_batch", os.path.join(OPENAI_DIR, "batch.py"))
+    openai_batch = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(openai_batch)
+
+    paths = write_documents(tmp_path / "docs", [5, 8, 12])
+    assert openai_batch.main([str(tmp_path / "docs"), "--workers", "3"]) == 0
+
+    assert config.provider == "openai"
+    assert len(clients) == 1
+    assert len(limiters) == 1
+    assert limiters[0].reservations == clients[0].calls > len(paths)
+    for path in paths:
+        assert DocumentProcessor.find_output(path) is not None
@@ -0,0 +1,105 @@
+import random
+import re
+
+import pytest
+
+from section_parser import SectionParser
+
+RESPONSE = """# Föreläsning om fotosyntes
+SECTION: Inledning
+Talaren presenterar ämnet.
+Första stycket fortsätter här.
+
+**SECTION:** Ljusreaktionen
+Ljus driver elektrontransporten.
+SECTIONS av texten nämns bara i förbigående.
+## SECTION: Calvincykeln
+Koldioxid binds in.
+
+__SECTION__: Sammanfattning
+Allt hänger ihop.
+
+"""
+
+MARKER = re.compile(r"SECTION[*_]*\s*:")
+
+
+def feed_fragments(fragments):
+    parser = SectionParser()
+    for fragment in fragments:
+        parser.feed(fragment)
+    return parser.close()
+
+
+def test_parses_title_and_sections():
+    title, sections = SectionParser.parse(RESPONSE)
+
+    assert title == "Föreläsning om fotosyntes"
+    assert [section["title"] for section in sections] == ["Inledning", "Ljusreaktionen", "Calvincykeln", "Sammanfattning"]
+    assert sections[0]["content"] == "Talaren presenterar ämnet.\nFörsta stycket fortsätter här.\n\n"
+    assert sections[1]["content"] == "Ljus driver elektrontransporten.\nSECTIONS av texten nämns bara i förbigående.\n"
+    assert sections[-1]["content"] == "Allt hänger ihop.\n"
+
+
+def test_one_character_at_a_time():
+    assert feed_fragments(RESPONSE) == SectionParser.parse(RESPONSE)
+
+
+@pytest.mark.parametrize("offset", range(len(RESPONSE) + 1))
+def test_split_in_two_at_every_offset(offset):
+    # Covers every marker, including the markdown around it, split across fragments
+    assert feed_fragments([RESPONSE[:offset], RESPONSE[offset:]]) == SectionParser.parse(RESPONSE)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_fragment_sizes(seed):
+    rng = random.Random(seed)
+    fragments = []
+    position = 0
+    while position < len(RESPONSE):
+        size = rng.randint(1, 12)
+        fragments.append(RESPONSE[position:position + size])
+        position += size
+
+    assert feed_fragments(fragments) == SectionParser.parse(RESPONSE)
+
+
+@pytest.mark.parametrize("offset", range(len(RESPONSE.encode("utf-8")) + 1))
+def test_truncated_at_every_byte_offset(offset):
+    # A response cut off anywhere keeps every section that started before the
+    # cut, and the last one holds the text up to it
+    prefix = RESPONSE.encode("utf-8")[:offset].decode("utf-8", errors="ignore")
+    full_title, full_sections = SectionParser.parse(RESPONSE)
+
+    title, sections = SectionParser.parse(prefix)
+
+    assert full_title.startswith(title)
+    if not MARKER.search(prefix):
+        # Text before the first section becomes one section, or none
+        assert len(sections) <= 1
+        return
+    assert len(sections) == len(MARKER.findall(prefix))
+    assert sections[:-1] == full_sections[:len(sections) - 1]
+    last, full = sections[-1], full_sections[len(sections) - 1]
+    assert full["title"].startswith(last["title"])
+    # The cut may fall inside the next marker line, which is then content
+    content, full_content = last["content"].rstrip(), full["content"].rstrip()
+    assert full_content.startswith(content) or content.startswith(full_content)
+
+
+def test_response_without_sections_becomes_one_section():
+    title, sections = SectionParser.parse("Titel\nBara löptext utan rubriker.\nTvå rader.")
+
+    assert title == "Titel"
+    assert sections == [{"title": "Titel", "content": "Bara löptext utan rubriker.\nTvå rader.\n"}]
+
+
+def test_response_that_starts_with_a_section_has_no_title():
+    title, sections = SectionParser.parse("SECTION: Första\nText.")
+
+    assert title == ""
+    assert sections == [{"title": "Första", "content": "Text.\n"}]
+
+
+def test_empty_response():
+    assert SectionParser.parse("") == ("", [])
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from job_queue import FINISHED
+from service import Service
+
+
+@pytest.fixture
+def service(config):
+    # The service with the fake provider on a free port, serving in the background
+    config.fake_latency = 0.005
+    config.service_workers = 2
+    service = Service(config)
+    service.listen("127.0.0.1", 0)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service.server.shutdown()
+    thread.join(30)
+
+
+def request(service, method, path, body=None):
+    host, port = service.server.server_address[:2]
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    http_request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method)
+    try:
+        with urllib.request.urlopen(http_request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def wait_for(service, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, body = request(service, "GET", f"/jobs/{job_id}")
+        assert status == 200
+        job = json.loads(body)
+        if job["status"] in FINISHED:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def api_calls_total(metrics_text):
+    return sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in metrics_text.splitlines()
+        if line.startswith("document_processor_api_calls_total{")
+    )
+
+
+def test_text_job_round_trip(service, paragraphs, assert_in_order):
+    status, body = request(service, "POST", "/jobs", {"text": "\n\n".join(paragraphs), "name": "lecture"})
+    assert status == 202
+    job_id = json.loads(body)["id"]
+
+    job = wait_for(service, job_id)
+    assert job["status"] == "done"
+    status, result = request(service, "GET", f"/jobs/{job_id}/result")
+    assert status == 200
+    assert_in_order(result.decode("utf-8"), paragraphs)
+
+    status, body = request(service, "GET", "/health")
+    assert status == 200
+    assert json.loads(body)["jobs"]["done"] == 1
+
+
+def test_jobs_on_one_file_keep_their_own_output_and_metrics(config, service, transcript):
+    # Without checkpoints every job makes the same calls again
+    config.resume_runs = False
+    job_ids = []
+    for _ in range(2):
+        status, body = request(service, "POST", "/jobs", {"path": transcript})
+        assert status == 202
+        job_ids.append(json.loads(body)["id"])
+    jobs = sorted((wait_for(service, job_id) for job_id in job_ids), key=lambda job: job["started_at"])
+
+    assert [job["status"] for job in jobs] == ["done", "done"]
+    # They ran one after the other, each writing its own output
+    assert jobs[1]["started_at"] >= jobs[0]["finished_at"]
+    assert jobs[0]["output_path"] != jobs[1]["output_path"]
+    assert all(os.path.isfile(job["output_path"]) for job in jobs)
+
+    # Each report holds only its own job's calls
+    reports = {}
+    for job_id in job_ids:
+        names = [name for name in os.listdir(config.metrics_dir) if job_id in name]
+        assert len(names) == 1
+        with open(os.path.join(config.metrics_dir, names[0]), encoding="utf-8") as file:
+            reports[job_id] = json.load(file)
+    calls = [reports[job_id]["totals"]["calls"] for job_id in job_ids]
+    assert calls[0] == calls[1] > 0
+
+    # The Prometheus totals still count both, after their records were dropped
+    assert service.processor.metrics.calls == []
+    status, body = request(service, "GET", "/metrics")
+    assert status == 200
+    assert "# TYPE document_processor_api_calls_total counter" in body.decode("utf-8")
+    assert api_calls_total(body.decode("utf-8")) == sum(calls)
+
+
+def test_errors(service, tmp_path):
+    assert request(service, "GET", "/jobs/unknown")[0] == 404
+    assert request(service, "POST", "/jobs", {})[0] == 400
+    assert request(service, "POST", "/jobs", {"path": str(tmp_path / "missing.txt")})[0] == 400
+    assert request(service, "GET", "/nothing")[0] == 404
@@ -0,0 +1,182 @@
+import random
+
+import pytest
+
+from text_processor import TextChunker
+from tokenizer import ApproximateBackend, get_token_counter
+
+
+def words(count, word="ord"):
+    return " ".join([word] * count)
+
+
+def transcript(seed, turns=30):
+    # Speaker turns of sentences, with paragraphs, line breaks, tabs and double
+    # spaces inside the turns. Every sentence is numbered, so each chunk is
+    # found in one place only.
+    rng = random.Random(seed)
+    lines = []
+    number = 0
+    for turn in range(turns):
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            number += 1
+            sentence = words(rng.randint(2, 12), rng.choice(["ord", "fotosyntes", "svar", "Ett"]))
+            sentences.append(f"{sentence} nr{number}" + rng.choice([".", "?", "!", ""]))
+        separators = [rng.choice([" ", "  ", "\n", "\n\n", "\t"]) for _ in sentences[1:]]
+        body = sentences[0] + "".join(separator + sentence for separator, sentence in zip(separators, sentences[1:]))
+        lines.append(f"Talare {turn % 3}: {body}")
+    return "\n".join(lines)
+
+
+@pytest.fixture
+def chunker(config):
+    config.target_token_count = 60
+    config.chunk_boundary_window = 0.9
+    config.chunk_overlap_tokens = 0
+    return TextChunker(get_token_counter("approximate"), config)
+
+
+def positions(text, chunks):
+    # Where each chunk starts in the text, searching after the previous start
+    found = []
+    start = -1
+    for chunk in chunks:
+        start = text.find(chunk, start + 1)
+        assert start >= 0
+        found.append(start)
+    return found
+
+
+@pytest.mark.parametrize("text, ends_with", [
+    # A speaker turn beats the later paragraph and sentence breaks
+    (f"Talare 1: {words(10)} turn.\n\nTalare 2: {words(5)} stycke.\n\n{words(5)} mening. {words(90)}", "turn."),
+    # A paragraph beats the later line and sentence breaks
+    (f"Talare 1: {words(10)} stycke.\n\n{words(5)} rad.\n{words(5)} mening. {words(90)}", "stycke."),
+    # A line beats the later sentence break
+    (f"Talare 1: {words(10)} rad.\n{words(5)} mening. {words(5)} mening. {words(90)}", "rad."),
+    # A sentence beats the later word breaks
+    (f"Talare 1: {words(10)} mening. {words(5)} {words(90)}", "mening."),
+])
+def test_chunk_ends_on_the_strongest_break(chunker, text, ends_with):
+    chunks = chunker.chunk_text(text)
+
+    assert chunks[0].endswith(ends_with)
+    assert text.startswith(chunks[0])
+
+
+def test_chunk_without_breaks_ends_between_words(chunker):
+    text = words(200, "ordet")
+    chunks = chunker.chunk_text(text)
+
+    assert len(chunks) > 1
+    assert all(set(chunk.split()) == {"ordet"} for chunk in chunks)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_keep_the_original_whitespace(chunker, seed):
+    text = transcript(seed)
+    chunks = chunker.chunk_text(text)
+    starts = positions(text, chunks)
+
+    # The chunks are slices of the text, and only whitespace lies between them
+    rebuilt = ""
+    for chunk, start in zip(chunks, starts):
+        assert text[len(rebuilt):start].strip() == ""
+        rebuilt = text[:start] + chunk
+    assert rebuilt == text.rstrip()
+    assert any("\n\n" in chunk for chunk in chunks)
+    assert any("\t" in chunk for chunk in chunks)
+
+
+@pytest.mark.parametrize("target", [20, 60, 200])
+@pytest.mark.parametrize("overlap", [0, 10])
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_stay_within_the_target(config, chunker, target, overlap, seed):
+    config.target_token_count = target
+    config.chunk_overlap_tokens = overlap
+
+    chunks = chunker.chunk_text(transcript(seed))
+
+    assert len(chunks) > 1
+    assert max(chunker.token_counter.count_tokens(chunk) for chunk in chunks) <= target
+
+
+class EdgeCounter:
+    # Counts a few more tokens for a text on its own than its offsets show, as
+    # a real tokenizer may at the edges of a slice
+    EXTRA = 3
+
+    def __init__(self):
+        self.backend = ApproximateBackend()
+
+    def token_offsets(self, text):
+        return self.backend.token_offsets(text)
+
+    def count_tokens(self, text):
+        return self.backend.count_tokens(text) + self.EXTRA
+
+
+def test_chunks_that_grow_when_encoded_alone_are_shortened(config):
+    config.target_token_count = 60
+    chunker = TextChunker(EdgeCounter(), config)
+
+    chunks = chunker.chunk_text(words(500))
+
+    assert max(chunker.token_counter.count_tokens(chunk) for chunk in chunks) <= 60
+
+
+def test_overlap_repeats_up_to_the_configured_tokens(config, chunker):
+    config.chunk_overlap_tokens = 10
+    text = " ".join(f"Ett {words(2)} nr{number}." for number in range(100))
+
+    chunks = chunker.chunk_text(text)
+    starts = positions(text, chunks)
+
+    for previous, start, next_start, chunk in zip(chunks, starts, starts[1:], chunks[1:]):
+        overlap = text[next_start:start + len(previous)]
+        assert overlap
+        assert chunker.token_counter.count_tokens(overlap) <= 10
+        # The overlap starts on a sentence, the strongest break in reach
+        assert chunk.startswith("Ett ")
+
+
+def test_no_overlap_by_default(chunker):
+    text = transcript(0)
+    chunks = chunker.chunk_text(text)
+
+    for previous, start, next_start in zip(chunks, positions(text, chunks), positions(text, chunks)[1:]):
+        assert next_start >= start + len(previous)
+
+
+@pytest.mark.parametrize("overlap", [0, 10])
+@pytest.mark.parametrize("block_size", [1, 7, 100, 10**6])
+def test_iter_chunks_matches_chunk_text(config, chunker, overlap, block_size):
+    config.chunk_overlap_tokens = overlap
+    text = transcript(1, turns=80)
+    blocks = [text[i:i + block_size] for i in range(0, len(text), block_size)]
+
+    assert list(chunker.iter_chunks(blocks)) == chunker.chunk_text(text)
+
+
+@pytest.mark.parametrize("overlap", [0, 10])
+def test_rechunk_of_unchanged_text_matches_chunk_text(config, chunker, overlap):
+    config.chunk_overlap_tokens = overlap
+    text = transcript(2)
+    chunks = chunker.chunk_text(text)
+
+    assert chunker.rechunk(text, chunks) == chunks
+
+
+def test_rechunk_only_chunks_the_edited_stretch_again(chunker):
+    text = transcript(3)
+    chunks = chunker.chunk_text(text)
+    middle = len(chunks) // 2
+    edited = text.replace(chunks[middle], chunks[middle].replace("Talare", "Talarinna", 1), 1)
+
+    rechunked = chunker.rechunk(edited, chunks)
+
+    assert rechunked[:middle] == chunks[:middle]
+    assert rechunked[-(len(chunks) - middle - 1):] == chunks[middle + 1:]
+    assert "Talarinna" in "".join(rechunked[middle:len(rechunked) - (len(chunks) - middle - 1)])
+    assert max(chunker.token_counter.count_tokens(chunk) for chunk in rechunked) <= 60
@@ -0,0 +1,53 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from tokenizer import ApproximateBackend, TokenCounter, TransformersBackend
+
+
+class RecordingTokenizerFast:
+    # Stands in for transformers.GPT2TokenizerFast with an empty local cache,
+    # recording whether each load was allowed to download
+    loads = []
+
+    @classmethod
+    def from_pretrained(cls, name, local_files_only=False):
+        cls.loads.append(local_files_only)
+        if local_files_only:
+            raise OSError("gpt2 is not in the local cache")
+        return cls()
+
+
+@pytest.fixture
+def transformers(monkeypatch):
+    RecordingTokenizerFast.loads = []
+    monkeypatch.setitem(sys.modules, "transformers", SimpleNamespace(GPT2TokenizerFast=RecordingTokenizerFast))
+    return RecordingTokenizerFast
+
+
+def test_auto_never_downloads(tmp_path, capsys, transformers):
+    counter = TokenCounter("auto", str(tmp_path / "missing-tokenizer.json"))
+
+    assert isinstance(counter.backend, ApproximateBackend)
+    assert transformers.loads == [True]
+    assert "using approximate token counts" in capsys.readouterr().out
+
+
+def test_transformers_backend_downloads_when_not_cached(transformers):
+    counter = TokenCounter("transformers")
+
+    assert isinstance(counter.backend, TransformersBackend)
+    assert transformers.loads == [True, False]
+
+
+def test_counts_are_memoized():
+    counter = TokenCounter("approximate", cache_size=2)
+
+    assert counter.count_tokens("Talare 1: hej") == counter.count_tokens("Talare 1: hej")
+    assert (counter.cache_hits, counter.cache_misses) == (1, 1)
+    counter.count_tokens("ett")
+    counter.count_tokens("två")
+    # The oldest count was evicted
+    counter.count_tokens("Talare 1: hej")
+    assert counter.cache_misses == 4